@@ -2,45 +2,20 @@
 """
 This module contains a generator function to stream user data from a database.
 """
-import mysql.connector
-from mysql.connector import Error
-import os
+from db_driver import Error
+from db_pool import connect_to_prodev
+from user_rows import USER_SELECT, STREAM_FETCH_SIZE, fetch_rows, discard_unread_result
+from user_ids import BINARY_IDS
 
-# --- Database Configuration ---
-# Read from environment variables for security
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = 'ALX_prodev'
 
-
-def connect_to_prodev():
-    """Connects to the ALX_prodev database in MYSQL."""
-    connection = None
-    if not DB_USER or not DB_PASS:
-        print("Error: DB_USER and DB_PASS environment variables are not set.")
-        return None
-
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME
-        )
-        if connection.is_connected():
-            print(f"Successfully connected to database '{DB_NAME}'.")
-    except Error as e:
-        print(f"Error connecting to database '{DB_NAME}': {e}")
-        return None
-    
-    return connection
-
-
-def stream_users():
+def stream_users(streaming=False, fetch_size=STREAM_FETCH_SIZE, row_format='dict'):
     """
     Generator that streams user_data rows one by one.
     This function uses 'yield' and has only one loop.
+
+    streaming=True switches to an explicitly unbuffered cursor that pulls
+    'fetch_size' rows per round trip; 'row_format' may be 'dict', 'tuple'
+    or 'record' (see seed.stream_user_data).
     """
     connection = None
     cursor = None
@@ -51,12 +26,20 @@ def stream_users():
             print("Failed to connect to the database. Aborting.")
             return
 
+        if streaming or row_format != 'dict':
+            # 2./3. Unbuffered cursor, rows shaped without a per-row dict
+            cursor = connection.cursor(buffered=False) if streaming else connection.cursor()
+            cursor.execute(f"{USER_SELECT};")
+            yield from fetch_rows(cursor, fetch_size, row_format)
+            return
+
         # 2. Create a cursor
         # dictionary=True returns rows as dictionaries (e.g., row['name'])
         cursor = connection.cursor(dictionary=True)
 
         # 3. Execute the query
-        cursor.execute("SELECT * FROM user_data;")
+        # (binary user_ids must be converted back to text, see user_ids.py)
+        cursor.execute(f"{USER_SELECT};" if BINARY_IDS else "SELECT * FROM user_data;")
 
         # 4. The single loop that yields rows one by one
         # The cursor itself is an iterator, so this is very efficient.
@@ -68,6 +51,7 @@ def stream_users():
     finally:
         # 5. Clean up resources
         if cursor:
+            discard_unread_result(connection)
             cursor.close()
         if connection and connection.is_connected():
             connection.close()
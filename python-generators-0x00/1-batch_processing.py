@@ -2,43 +2,100 @@
 """
 This module contains functions to stream and process user data in batches.
 """
-import mysql.connector
-from mysql.connector import Error
 import os
+from itertools import count
+from db_driver import Error
+from db_pool import connect_to_prodev
+from partitioned_scan import scan_partitioned
+from prefetch import prefetched
+from snapshot import open_snapshot
+from pipeline import Pipeline
+from columnar import ColumnBatch, Predicate, where_clause
+from user_rows import USER_SELECT, USER_SELECT_LIST, discard_unread_result, row_factory
 
-# --- Database Configuration ---
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = 'ALX_prodev'
 
+# The filter batch_processing() applies, as a pushable predicate
+OVER_25 = Predicate('age', '>', 25)
 
-def connect_to_prodev():
-    """Helper function to connect to the ALX_prodev database."""
-    connection = None
-    if not DB_USER or not DB_PASS:
-        print("Error: DB_USER and DB_PASS environment variables are not set.")
-        return None
 
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME
-        )
-    except Error as e:
-        print(f"Error connecting to database '{DB_NAME}': {e}")
-        return None
-    
-    return connection
+def _filter_batch(batch, predicates, columnar):
+    """Applies predicates that were not pushed down to the database."""
+    if columnar:
+        return batch.filter(predicates)
+    return [row for row in batch if all(p.matches(row) for p in predicates)]
 
 
-def stream_users_in_batches(batch_size=5):
+def stream_users_in_batches(batch_size=5, partitions=1, ordered=True, where=None,
+                            pushdown=True, columnar=False, prefetch=0, row_format='dict',
+                            snapshot=False):
     """
     Generator that fetches rows in batches from the user_data table.
     This function uses 'yield' and has only one loop.
+
+    With partitions > 1 the table is split into user_id ranges that are
+    read concurrently on separate pooled connections and merged back
+    into one stream (see partitioned_scan.scan_partitioned, which caps
+    'partitions' at the pool size and raises if a partition fails).
+    'ordered' chooses between user_id order and arrival order.
+
+    'where' is a list of columnar.Predicate. With pushdown=True they go
+    into the SQL WHERE clause; otherwise they are applied to each fetched
+    batch (as vectorized masks in columnar mode). columnar=True yields
+    columnar.ColumnBatch objects instead of lists of dicts.
+
+    row_format='record' builds each row as a compact user_rows.UserRecord
+    instead of a dict (records still support user['name']); 'tuple'
+    yields plain tuples in USER_COLUMNS order.
+
+    prefetch=K fetches up to K batches ahead on a background thread
+    while the caller works on the current one (see prefetch.prefetched).
+
+    snapshot=True reads the local memory-mapped copy of user_data
+    (snapshot.open_snapshot, refreshed only when the table changed)
+    instead of scanning the database; 'where' is then always applied
+    locally and 'partitions' is ignored. Rows come in user_id order.
     """
+    if prefetch > 0:
+        yield from prefetched(
+            stream_users_in_batches(batch_size, partitions, ordered, where,
+                                    pushdown, columnar, row_format=row_format,
+                                    snapshot=snapshot),
+            prefetch)
+        return
+
+    if snapshot:
+        local = open_snapshot()
+        if local is not None:
+            print(f"Streaming users in batches of {batch_size} from {local.path}...")
+            try:
+                yield from local.batches(batch_size, where, columnar, row_format)
+            finally:
+                local.close()
+            return
+        print("No snapshot available; reading the database instead.")
+
+    sql_where = where if pushdown else None
+    local_where = None if pushdown else where
+    # Rows are fetched as tuples unless a dict is wanted, then shaped here
+    as_dict = row_format == 'dict' and not columnar
+    make_row = None if as_dict or columnar else row_factory(row_format)
+
+    if partitions > 1:
+        print(f"Streaming users in batches of {batch_size} across {partitions} partitions...")
+        batches = scan_partitioned(batch_size, partitions, ordered,
+                                   columns=USER_SELECT_LIST, where=sql_where,
+                                   dictionary=as_dict)
+        for batch in batches:
+            if columnar:
+                batch = ColumnBatch.from_rows(batch)
+            elif make_row is not None:
+                batch = list(map(make_row, batch))
+            if local_where:
+                batch = _filter_batch(batch, local_where, columnar)
+            if len(batch):
+                yield batch
+        return
+
     connection = None
     cursor = None
     try:
@@ -49,18 +106,34 @@ def stream_users_in_batches(batch_size=5):
             return
 
         print(f"Successfully connected. Streaming users in batches of {batch_size}...")
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data;")
+        # Plain tuples in USER_COLUMNS order unless dicts are wanted
+        cursor = connection.cursor(dictionary=as_dict)
+        query = USER_SELECT
+
+        params = ()
+        if sql_where:
+            condition, params = where_clause(sql_where)
+            query += f" WHERE {condition}"
+        cursor.execute(f"{query};", params)
 
         # --- The 1st Loop ---
         while True:
             # 2. Fetch a batch of rows
             batch = cursor.fetchmany(batch_size)
-            
+
             # 3. If the batch is empty, we're done
             if not batch:
                 break
-            
+
+            if columnar:
+                batch = ColumnBatch.from_rows(batch)
+            elif make_row is not None:
+                batch = list(map(make_row, batch))
+            if local_where:
+                batch = _filter_batch(batch, local_where, columnar)
+                if not len(batch):
+                    continue
+
             # 4. Yield the batch to the caller
             yield batch
 
@@ -69,48 +142,94 @@ def stream_users_in_batches(batch_size=5):
     finally:
         # 5. Clean up resources
         if cursor:
+            discard_unread_result(connection)
             cursor.close()
         if connection and connection.is_connected():
             connection.close()
             print("\nDatabase connection closed.")
 
 
-def batch_processing(batch_size=5):
+def _batch_users(batch):
+    """The users of a batch as rows indexable by column name."""
+    return batch.rows() if isinstance(batch, ColumnBatch) else batch
+
+
+def process_users_in_batches(function, batch_size=1000, workers=None, in_flight=None,
+                             ordered=True, where=None, partitions=1, snapshot=False):
+    """
+    Fans the batches of stream_users_in_batches() out to a process pool
+    and yields function(batch) for each, for CPU-heavy per-batch work
+    (scoring, enrichment) that a single core can't keep up with.
+
+    'function' must be a module-level (picklable) callable taking a
+    columnar.ColumnBatch; batches cross to the workers in ColumnBatch's
+    packed form rather than as pickled lists of dicts. At most
+    'in_flight' batches (default two per worker) are out at once, so
+    the database read slows down to the workers' pace instead of
+    queueing batches in memory. Results come back in input order, or
+    as soon as each is ready with ordered=False. workers=1 runs
+    'function' inline. Returns a pipeline.Pipeline: iterate it for the
+    results, then call report() for per-stage timings.
+    """
+    workers = workers or os.cpu_count() or 1
+    batches = stream_users_in_batches(batch_size, partitions, ordered, where=where,
+                                      columnar=True, snapshot=snapshot)
+    return Pipeline(batches, name='batches').map(
+        function, name=getattr(function, '__name__', 'process'),
+        mode='process' if workers > 1 else 'inline', workers=workers,
+        queue_size=in_flight, ordered=ordered)
+
+
+def over_25_pipeline(batch_size=5, partitions=1, ordered=True, columnar=False,
+                     row_format='dict', snapshot=False, process=None, workers=None):
+    """
+    The pipeline behind batch_processing(): batches of users over 25
+    from stream_users_in_batches() (the filter is pushed down), mapped to
+    rows. Add stages (e.g. a process-pool map) before running it.
+
+    With 'process', each batch first goes through process(batch) on
+    'workers' processes (see process_users_in_batches); it gets a
+    ColumnBatch and returns the batch to print, as a ColumnBatch or a
+    list of rows.
+    """
+    if process is not None:
+        pipeline = process_users_in_batches(process, batch_size, workers, ordered=ordered,
+                                            where=[OVER_25], partitions=partitions,
+                                            snapshot=snapshot)
+    else:
+        batches = stream_users_in_batches(batch_size, partitions, ordered, where=[OVER_25],
+                                          columnar=columnar, row_format=row_format,
+                                          snapshot=snapshot)
+        pipeline = Pipeline(batches, name='batches')
+    return pipeline.map(_batch_users, name='rows')
+
+
+def batch_processing(batch_size=5, partitions=1, ordered=True, columnar=False,
+                     row_format='dict', snapshot=False, process=None, workers=None):
     """
     Processes each batch to filter users over the age of 25.
-    This function uses two loops.
+
+    The age filter is pushed down to the database, so every batch that
+    arrives already holds only users over 25. The work runs as a
+    pipeline (see over_25_pipeline) whose sink prints each batch.
+    'partitions', 'ordered', 'columnar', 'row_format' and 'snapshot' are
+    passed on to stream_users_in_batches(). 'process' and 'workers' run
+    per-batch work on a process pool first; ordered=False then prints
+    batches as they finish instead of in input order.
     """
     print(f"\n--- Starting Batch Processing (filter for age > 25) ---")
-    
-    # Get the generator object
-    batch_generator = stream_users_in_batches(batch_size)
-    
-    batch_number = 1
-    
-    # --- The 2nd Loop ---
-    for batch in batch_generator:
-        print(f"\nProcessing Batch #{batch_number} (raw data):")
-        # print(batch) # Uncomment to see the full raw batch
-        
-        filtered_users = []
-        
-        # --- The 3rd Loop ---
-        for user in batch:
-            if user['age'] > 25:
-                filtered_users.append(user)
-        
-        # --- End of 3rd Loop ---
-        
-        if filtered_users:
-            print(f"Users over 25 in this batch:")
-            for user in filtered_users:
-                print(f"  - {user['name']} (Age: {user['age']})")
-        else:
-            print("No users over 25 in this batch.")
-            
-        batch_number += 1
-    # --- End of 2nd Loop ---
-    
+
+    batch_numbers = count(1)
+
+    def print_batch(users):
+        print(f"\nProcessing Batch #{next(batch_numbers)}:")
+        print(f"Users over 25 in this batch:")
+        for user in users:
+            print(f"  - {user['name']} (Age: {user['age']})")
+
+    over_25_pipeline(batch_size, partitions, ordered, columnar, row_format, snapshot,
+                     process, workers).run(print_batch, name='print')
+
     print("\n--- Batch processing complete ---")
 
 
@@ -1,32 +1,143 @@
-def paginate_users(page_size, offset):
+#!/usr/bin/python3
+"""
+This module contains functions to fetch user_data one page at a time
+and a generator that lazily walks through all the pages.
+"""
+import base64
+import json
+from db_driver import Error
+from user_ids import BINARY_IDS, user_id_param
+from user_rows import USER_SELECT
+
+seed = __import__('seed')
+
+
+def paginate_users(page_size, offset, connection=None):
     """
     Fetches a single page of users from the database using LIMIT and OFFSET.
+
+    If 'connection' is given it is reused and left open; otherwise a
+    connection is opened and closed for this page only.
+    Note: the server still reads and discards 'offset' rows, so deep pages
+    get slower. Use paginate_users_after() to walk the whole table.
     """
-    connection = None
+    own_connection = connection is None
     cursor = None
     try:
-        connection = connect_to_prodev()
+        if own_connection:
+            connection = seed.connect_to_prodev()
         if connection is None:
             return []  # Connection failed
-        
+
         cursor = connection.cursor(dictionary=True)
-        
+
         # --- THIS IS THE FIX ---
         # The checker wants the literal string "SELECT * FROM user_data LIMIT"
         # We have removed the "ORDER BY name" part to match the checker.
         query = "SELECT * FROM user_data LIMIT %s OFFSET %s"
-        
+        if BINARY_IDS:
+            # Binary user_ids must be converted back to text (see user_ids.py)
+            query = f"{USER_SELECT} LIMIT %s OFFSET %s"
+
         # The tuple (page_size, offset) passes arguments safely
         cursor.execute(query, (page_size, offset))
-        
+
         page_data = cursor.fetchall()
         return page_data
-        
+
     except Error as e:
         print(f"Error paginating data: {e}")
         return []
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
\ No newline at end of file
+        if own_connection and connection and connection.is_connected():
+            connection.close()
+
+
+# --- Keyset (seek) pagination ---
+def encode_token(last_user_id):
+    """Packs the last user_id of a page into an opaque continuation token."""
+    payload = json.dumps({'after': last_user_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_token(token):
+    """Unpacks a continuation token made by encode_token()."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))['after']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid continuation token: {token!r}") from e
+
+
+def paginate_users_after(page_size, token=None, connection=None):
+    """
+    Fetches the page of users that follows 'token', ordered by user_id.
+
+    Instead of skipping rows with OFFSET, the query seeks straight to the
+    last user_id seen using the primary key, so every page costs the same
+    however deep it is. Returns (page_data, next_token); next_token is
+    None once the last page has been read.
+    """
+    own_connection = connection is None
+    cursor = None
+    try:
+        if own_connection:
+            connection = seed.connect_to_prodev()
+        if connection is None:
+            return [], None  # Connection failed
+
+        cursor = connection.cursor(dictionary=True)
+
+        if token is None:
+            cursor.execute(
+                f"{USER_SELECT} ORDER BY user_data.user_id LIMIT %s", (page_size,))
+        else:
+            cursor.execute(
+                f"{USER_SELECT} WHERE user_id > %s ORDER BY user_data.user_id LIMIT %s",
+                (user_id_param(decode_token(token)), page_size))
+
+        page_data = cursor.fetchall()
+        if len(page_data) < page_size:
+            return page_data, None
+        return page_data, encode_token(page_data[-1]['user_id'])
+
+    except Error as e:
+        print(f"Error paginating data: {e}")
+        return [], None
+    finally:
+        if cursor:
+            cursor.close()
+        if own_connection and connection and connection.is_connected():
+            connection.close()
+
+
+def lazy_pagination(page_size, keyset=False):
+    """
+    Generator that lazily fetches pages of users, only when they are needed.
+    One connection is opened for the whole walk and reused for every page.
+
+    With keyset=True pages are read with paginate_users_after(), ordered by
+    user_id, instead of LIMIT/OFFSET.
+    """
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        print("Failed to connect to the database. Aborting.")
+        return
+
+    try:
+        offset = 0
+        token = None
+        while True:
+            if keyset:
+                page, token = paginate_users_after(page_size, token, connection)
+            else:
+                page = paginate_users(page_size, offset, connection)
+                offset += page_size
+            if page:
+                yield page
+            if len(page) < page_size:
+                break
+    finally:
+        if connection.is_connected():
+            connection.close()
@@ -3,44 +3,44 @@
 This module contains a generator to stream user ages and a function
 to calculate the average age in a memory-efficient way.
 """
-import mysql.connector
-from mysql.connector import Error
-import os
-from decimal import Decimal
+from functools import partial
+from db_driver import Error
+from db_pool import connect_to_prodev
+from aggregates import age_buckets, aggregate_ages_sql, buckets_as_dict, merge_buckets
+from user_stats import read_stats
+from sketches import DEFAULT_K, DEFAULT_PRECISION, HyperLogLog, KLLSketch
+from user_rows import discard_unread_result
+from user_ids import USER_ID_SELECT
+from snapshot import open_snapshot
+from pipeline import Pipeline
 
-# --- Database Configuration ---
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = 'ALX_prodev'
 
+# Columns stream_user_column() may read
+STREAMABLE_COLUMNS = ('user_id', 'name', 'email', 'age')
 
-def connect_to_prodev():
-    """Helper function to connect to the ALX_prodev database."""
-    connection = None
-    if not DB_USER or not DB_PASS:
-        print("Error: DB_USER and DB_PASS environment variables are not set.")
-        return None
-
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME
-        )
-    except Error as e:
-        print(f"Error connecting to database '{DB_NAME}': {e}")
-        return None
-    
-    return connection
+# Ages accumulated per item of age_stats_pipeline()
+AGE_BATCH_SIZE = 10000
 
 
-def stream_user_ages():
+def stream_user_column(column, snapshot=False):
     """
-    Generator that yields user ages one by one from the database.
-    This function contains the first loop.
+    Generator that yields the values of a single user_data column one by
+    one from the database, or with snapshot=True from the local
+    memory-mapped copy (see snapshot.py).
     """
+    if column not in STREAMABLE_COLUMNS:
+        raise ValueError(f"Unknown column {column!r}")
+
+    if snapshot:
+        local = open_snapshot()
+        if local is not None:
+            try:
+                yield from local.column(column)
+            finally:
+                local.close()
+            return
+        print("No snapshot available; reading the database instead.")
+
     connection = None
     cursor = None
     try:
@@ -49,56 +49,143 @@ def stream_user_ages():
             print("Failed to connect to the database. Aborting.")
             return
 
-        print("Successfully connected. Streaming user ages...")
-        # We only select the 'age' column for efficiency
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT age FROM user_data;")
+        print(f"Successfully connected. Streaming user {column}s...")
+        # We only select the one column for efficiency, and use a plain
+        # tuple cursor so no dict is built per row
+        cursor = connection.cursor()
+        selected = USER_ID_SELECT if column == 'user_id' else column
+        cursor.execute(f"SELECT {selected} FROM user_data;")
 
-        # --- The 1st Loop ---
         # The cursor itself is an iterator, efficiently fetching rows.
         for row in cursor:
-            yield row['age'] # Yield only the age value
+            yield row[0] # Yield only the column value
 
     except Error as e:
         print(f"Error streaming data: {e}")
     finally:
         # 5. Clean up resources
         if cursor:
+            discard_unread_result(connection)
             cursor.close()
         if connection and connection.is_connected():
             connection.close()
             print("Database connection closed.")
 
 
-def calculate_average_age():
+def stream_user_ages(snapshot=False):
+    """
+    Generator that yields user ages one by one from the database
+    (or the snapshot, with snapshot=True).
+    This function contains the first loop.
+    """
+    # --- The 1st Loop ---
+    for age in stream_user_column('age', snapshot):
+        yield age
+
+
+def age_stats_pipeline(bucket_size=None, mode='inline', workers=1, snapshot=False):
+    """
+    The streaming path of aggregate_ages() as a pipeline: ages are
+    grouped into batches and each batch is accumulated into
+    aggregates.age_buckets(), on 'workers' threads or processes with
+    mode='thread' / 'process'. Fold the partial results with
+
+        buckets = age_stats_pipeline().reduce(merge_buckets, {})
+        aggregates.buckets_as_dict(buckets)
     """
-    Uses the stream_user_ages generator to calculate the average age
-    without loading the entire dataset into memory.
-    This function contains the second loop.
+    return (Pipeline(stream_user_ages(snapshot), name='ages')
+            .batch(AGE_BATCH_SIZE)
+            .map(partial(age_buckets, bucket_size=bucket_size), name='accumulate',
+                 mode=mode, workers=workers))
+
+
+def aggregate_ages(bucket_size=None, pushdown=True, use_stats=True, snapshot=False):
     """
-    
-    # We use Decimal for precision, just like in the database
-    total_age = Decimal('0')
-    user_count = 0
-    
-    # Get the generator object
-    age_generator = stream_user_ages()
-
-    # --- The 2nd Loop ---
-    # This loop pulls one age at a time from the generator
-    for age in age_generator:
-        total_age += age
-        user_count += 1
-    # --- End of 2nd Loop ---
-
-    # Calculate the average
-    if user_count > 0:
-        # Perform precise division
-        average_age = total_age / Decimal(user_count)
+    Returns count/sum/avg/min/max of user ages, or with 'bucket_size'
+    a {bucket_start: stats} dict grouped into age buckets.
+
+    snapshot=True computes it from the local memory-mapped copy of
+    user_data (see snapshot.py) without touching the table, unless the
+    snapshot is missing and can't be written.
+
+    Ungrouped results come straight from the user_data_stats table kept
+    up to date by seed.insert_data (use_stats=True), which is O(1).
+    Otherwise, with pushdown=True the aggregation runs inside the
+    database and only the result rows are transferred. If that fails
+    (or pushdown=False), the ages are streamed and accumulated in one
+    pass instead, through age_stats_pipeline().
+    """
+    if snapshot:
+        local = open_snapshot()
+        if local is not None:
+            try:
+                return local.aggregate(bucket_size)
+            finally:
+                local.close()
+        print("No snapshot available; reading the database instead.")
+
+    if pushdown or use_stats:
+        connection = connect_to_prodev()
+        if connection is not None:
+            try:
+                stats = read_stats(connection) if use_stats and bucket_size is None else None
+                if stats is not None:
+                    return stats
+                if pushdown:
+                    return aggregate_ages_sql(connection, bucket_size)
+            except Error as e:
+                print(f"Aggregate query failed ({e}), falling back to streaming.")
+            finally:
+                connection.close()
+
+    buckets = age_stats_pipeline(bucket_size, snapshot=snapshot).reduce(merge_buckets, {})
+    return buckets_as_dict(buckets, bucket_size)
+
+
+def calculate_average_age(pushdown=True, use_stats=True, snapshot=False):
+    """
+    Calculates the average age without loading the entire dataset into
+    memory. It is read from the maintained stats or computed by the
+    database when possible (see aggregate_ages); otherwise the
+    stream_user_ages generator is consumed in one pass. snapshot=True
+    reads the local snapshot instead.
+    """
+    stats = aggregate_ages(pushdown=pushdown, use_stats=use_stats, snapshot=snapshot)
+
+    if stats['count'] > 0:
         # We round to 2 decimal places for a clean print
-        print(f"Average age of users: {average_age:.2f}")
+        print(f"Average age of users: {stats['avg']:.2f}")
     else:
         print("No users found to calculate an average.")
+    return stats['avg']
+
+
+def age_percentiles(percentiles=(0.5, 0.95, 0.99), k=DEFAULT_K):
+    """
+    Returns {percentile: age} estimated with a KLL sketch fed from
+    stream_user_ages(), without materializing the age column.
+    Larger 'k' gives more accurate ranks at the cost of memory.
+    """
+    sketch = KLLSketch(k)
+    for age in stream_user_ages():
+        sketch.add(int(age))
+    return dict(zip(percentiles, sketch.quantiles(percentiles)))
+
+
+def estimate_distinct(column='email', precision=DEFAULT_PRECISION):
+    """
+    Approximate number of distinct values of 'column' using HyperLogLog.
+    column='domain' counts distinct email domains.
+    Standard error is about 1.04 / sqrt(2 ** precision).
+    """
+    counter = HyperLogLog(precision)
+    if column == 'domain':
+        for email in stream_user_column('email'):
+            counter.add(email.rpartition('@')[2].lower())
+    else:
+        for value in stream_user_column(column):
+            counter.add(value)
+    return counter.count()
 
 
 # --- Main Execution ---
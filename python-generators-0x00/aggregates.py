@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+"""
+This module contains the age aggregations (count/sum/avg/min/max,
+optionally grouped into age buckets) over user_data.
+
+aggregate_ages_sql() pushes the work into the database, so only one row
+per bucket crosses the wire. AgeStats is the one-pass streaming fallback
+for when that is not possible; it works on plain ints, not Decimal.
+"""
+from db_driver import get_driver
+
+AGGREGATE_QUERY = (
+    "SELECT COUNT(age), SUM(age), MIN(age), MAX(age) FROM user_data"
+)
+
+
+def _bucketed_aggregate_query():
+    return (
+        f"SELECT {get_driver().int_div('age', '%s')} * %s AS bucket, "
+        "COUNT(age), SUM(age), MIN(age), MAX(age) "
+        "FROM user_data GROUP BY bucket ORDER BY bucket"
+    )
+
+
+class AgeStats:
+    """
+    Running count/sum/min/max of ages. Ages are DECIMAL(3, 0) in the
+    table, i.e. whole numbers, so everything is kept as int.
+    Two AgeStats can be merged, e.g. partial results from parallel scans.
+    """
+    __slots__ = ('count', 'total', 'min', 'max')
+
+    def __init__(self, count=0, total=0, low=None, high=None):
+        self.count = count
+        self.total = total
+        self.min = low
+        self.max = high
+
+    def add(self, age):
+        age = int(age)
+        self.count += 1
+        self.total += age
+        if self.min is None or age < self.min:
+            self.min = age
+        if self.max is None or age > self.max:
+            self.max = age
+
+    def merge(self, other):
+        if other.count:
+            self.count += other.count
+            self.total += other.total
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'avg': self.average,
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+def age_buckets(ages, bucket_size=None):
+    """
+    One pass over an iterable of ages into {bucket_start: AgeStats}.
+    Without 'bucket_size' everything lands in the single bucket None.
+    Results of separate passes combine with merge_buckets().
+    """
+    buckets = {}
+    for age in ages:
+        bucket = None if bucket_size is None else int(age) // bucket_size * bucket_size
+        stats = buckets.get(bucket)
+        if stats is None:
+            stats = buckets[bucket] = AgeStats()
+        stats.add(age)
+    return buckets
+
+
+def merge_buckets(buckets, other):
+    """Merges the age_buckets() result 'other' into 'buckets' and returns it."""
+    for bucket, stats in other.items():
+        if bucket in buckets:
+            buckets[bucket].merge(stats)
+        else:
+            buckets[bucket] = stats
+    return buckets
+
+
+def buckets_as_dict(buckets, bucket_size=None):
+    """The age_buckets() result in accumulate_ages()'s shape."""
+    if bucket_size is None:
+        return buckets.get(None, AgeStats()).as_dict()
+    return {bucket: buckets[bucket].as_dict() for bucket in sorted(buckets)}
+
+
+def accumulate_ages(ages, bucket_size=None):
+    """
+    One pass over an iterable of ages (e.g. stream_user_ages()).
+    Returns a stats dict, or {bucket_start: stats dict} with 'bucket_size'.
+    """
+    return buckets_as_dict(age_buckets(ages, bucket_size), bucket_size)
+
+
+def stats_from_row(count, total, low, high):
+    """Turns one aggregate result row (Decimals or None) into AgeStats."""
+    if not count:
+        return AgeStats()
+    return AgeStats(int(count), int(total), int(low), int(high))
+
+
+def aggregate_ages_sql(connection, bucket_size=None):
+    """
+    Computes the same result as accumulate_ages() inside the database.
+    Database errors are left to the caller, which can fall back to
+    streaming.
+    """
+    cursor = connection.cursor()
+    try:
+        if bucket_size is None:
+            cursor.execute(AGGREGATE_QUERY)
+            return stats_from_row(*cursor.fetchone()).as_dict()
+
+        cursor.execute(_bucketed_aggregate_query(), (bucket_size, bucket_size))
+        return {int(row[0]): stats_from_row(*row[1:]).as_dict()
+                for row in cursor.fetchall()}
+    finally:
+        cursor.close()
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+"""
+This module contains 'async for' versions of the streaming generators,
+for use inside asyncio services:
+
+    async_stream_user_data       ~ seed.stream_user_data
+    async_stream_users_in_batches ~ 1-batch_processing.stream_users_in_batches
+    async_lazy_pagination        ~ 2-lazy_paginate.lazy_pagination
+    async_stream_user_ages       ~ 4-stream_ages.stream_user_ages
+
+They yield the same rows as the blocking versions. Each stream holds its
+own connection (aiomysql with an unbuffered SSCursor for MySQL, aiosqlite
+for SQLite, chosen by DB_BACKEND), and at most ASYNC_MAX_CONNECTIONS are
+open at once, so many streams can share one event loop. Cursors and
+connections are closed even when the consuming task is cancelled.
+"""
+import asyncio
+import os
+import sys
+import time
+import weakref
+from contextlib import asynccontextmanager
+from aggregates import AgeStats
+from db_driver import (DB_HOST, DB_NAME, DB_PASS, DB_PATH, DB_USER, MYSQL_FUNCTIONS,
+                       DriverError, get_driver)
+from user_ids import user_id_param
+from user_rows import USER_COLUMNS, USER_SELECT, STREAM_FETCH_SIZE, row_factory
+
+lazy_paginate = __import__('2-lazy_paginate')
+
+try:
+    import aiosqlite
+except ImportError:  # Only needed when DB_BACKEND=sqlite
+    aiosqlite = None
+
+try:
+    import aiomysql
+except ImportError:  # Only needed when DB_BACKEND=mysql
+    aiomysql = None
+
+# Connections the async streams may hold open at the same time
+ASYNC_MAX_CONNECTIONS = int(os.getenv('DB_ASYNC_MAX_CONNECTIONS', '20'))
+
+# One semaphore per event loop: asyncio primitives can't be shared across loops
+_slots = weakref.WeakKeyDictionary()
+
+
+def _connection_slots():
+    loop = asyncio.get_running_loop()
+    if loop not in _slots:
+        _slots[loop] = asyncio.Semaphore(ASYNC_MAX_CONNECTIONS)
+    return _slots[loop]
+
+
+async def _connect():
+    """Opens an async connection on the configured backend."""
+    backend = get_driver().name
+    if backend == 'sqlite':
+        if aiosqlite is None:
+            raise DriverError("Async SQLite streams need aiosqlite: pip install aiosqlite")
+        connection = await aiosqlite.connect(DB_PATH)
+        # BIN_TO_UUID()/UUID_TO_BIN()/MD5()/CONV(), as db_driver.SQLiteConnection adds them
+        for name, function in MYSQL_FUNCTIONS.items():
+            await connection.create_function(name, -1, function, deterministic=True)
+        return connection
+    if aiomysql is None:
+        raise DriverError("Async MySQL streams need aiomysql: pip install aiomysql")
+    return await aiomysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, db=DB_NAME)
+
+
+async def _open_cursor(connection):
+    if get_driver().name == 'sqlite':
+        return await connection.cursor()
+    # Unbuffered server-side cursor: rows stay on the server until fetched
+    return await connection.cursor(aiomysql.SSCursor)
+
+
+async def _close(cursor, connection):
+    try:
+        if cursor is not None:
+            await cursor.close()
+    finally:
+        if get_driver().name == 'sqlite':
+            await connection.close()
+        else:
+            connection.close()
+
+
+@asynccontextmanager
+async def _connection():
+    """Holds one connection slot and one connection for the block."""
+    async with _connection_slots():
+        connection = await _connect()
+        try:
+            yield connection
+        finally:
+            # Shielded so a second cancellation can't skip the close
+            await asyncio.shield(_close(None, connection))
+
+
+@asynccontextmanager
+async def _query(connection, query, params=()):
+    """Runs 'query' on a fresh cursor and always closes the cursor."""
+    cursor = await _open_cursor(connection)
+    try:
+        await cursor.execute(get_driver().sql(query), params)
+        yield cursor
+    finally:
+        await asyncio.shield(cursor.close())
+
+
+async def async_stream_user_data(fetch_size=STREAM_FETCH_SIZE, row_format='dict'):
+    """Async generator that streams user_data rows one by one."""
+    make_row = row_factory(row_format)
+    async with _connection() as connection:
+        async with _query(connection, f"{USER_SELECT};") as cursor:
+            while True:
+                rows = await cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row if make_row is None else make_row(row)
+
+
+async def async_stream_users_in_batches(batch_size=5):
+    """Async generator that yields lists of up to 'batch_size' user dicts."""
+    async with _connection() as connection:
+        async with _query(connection, f"{USER_SELECT};") as cursor:
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(USER_COLUMNS, row)) for row in rows]
+
+
+async def async_lazy_pagination(page_size, keyset=False):
+    """
+    Async generator that lazily fetches pages of users on one connection.
+    keyset=True seeks by user_id instead of using LIMIT/OFFSET, with the
+    same continuation tokens as 2-lazy_paginate.paginate_users_after().
+    """
+    async with _connection() as connection:
+        offset = 0
+        token = None
+        while True:
+            if not keyset:
+                query = f"{USER_SELECT} LIMIT %s OFFSET %s"
+                params = (page_size, offset)
+                offset += page_size
+            elif token is None:
+                query = f"{USER_SELECT} ORDER BY user_data.user_id LIMIT %s"
+                params = (page_size,)
+            else:
+                query = f"{USER_SELECT} WHERE user_id > %s ORDER BY user_data.user_id LIMIT %s"
+                params = (user_id_param(lazy_paginate.decode_token(token)), page_size)
+
+            async with _query(connection, query, params) as cursor:
+                page = [dict(zip(USER_COLUMNS, row)) for row in await cursor.fetchall()]
+            if page:
+                yield page
+            if len(page) < page_size:
+                break
+            token = lazy_paginate.encode_token(page[-1]['user_id'])
+
+
+async def async_stream_user_ages(fetch_size=STREAM_FETCH_SIZE):
+    """Async generator that yields user ages one by one."""
+    async with _connection() as connection:
+        async with _query(connection, "SELECT age FROM user_data;") as cursor:
+            while True:
+                rows = await cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+
+
+async def async_calculate_average_age():
+    """Streams every age once and returns the average (None if no users)."""
+    stats = AgeStats()
+    async for age in async_stream_user_ages():
+        stats.add(age)
+    return stats.average
+
+
+# --- Main Execution ---
+async def _count_rows():
+    count = 0
+    async for _ in async_stream_user_data(row_format='tuple'):
+        count += 1
+    return count
+
+
+async def _run_concurrently(streams):
+    return await asyncio.gather(*(_count_rows() for _ in range(streams)))
+
+
+if __name__ == "__main__":
+    """
+    Compares N full-table streams run one after another on the blocking
+    generator with the same N streams run concurrently on one event loop.
+    """
+    seed = __import__('seed')
+    streams = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+
+    started = time.perf_counter()
+    for _ in range(streams):
+        connection = seed.connect_to_prodev()
+        sum(1 for _ in seed.stream_user_data(connection, streaming=True, row_format='tuple'))
+        connection.close()
+    sync_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    counts = asyncio.run(_run_concurrently(streams))
+    async_seconds = time.perf_counter() - started
+
+    rows = sum(counts)
+    print(f"sync : {streams} streams, {rows} rows in {sync_seconds:.2f}s "
+          f"({rows / sync_seconds:.0f} rows/s)")
+    print(f"async: {streams} streams, {rows} rows in {async_seconds:.2f}s "
+          f"({rows / async_seconds:.0f} rows/s)")
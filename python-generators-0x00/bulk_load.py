@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+"""
+This module contains the fast path seed.insert_data takes for the first
+load into an empty SQLite user_data table: every chunk goes in through
+a single transaction, with synchronous=OFF and the rollback journal kept
+in memory. The declared secondary indexes are dropped first and rebuilt
+in one pass afterwards, and user_data_stats is recomputed once at the
+end instead of per chunk.
+
+bulk_load() returns None whenever the fast path can't be used (table
+not empty, DB_BULK_LOAD=0, or a MySQL backend, which has no fast path
+yet), and insert_data falls back to its normal chunked path.
+"""
+import os
+import time
+from db_driver import Error, get_driver
+from email_dedupe import EmailDeduper, existing_emails
+from ingest_checkpoint import clear_checkpoint, create_checkpoint_table
+from user_ids import new_user_id
+from user_indexes import create_indexes, drop_indexes
+from user_stats import rebuild_stats
+
+# DB_BULK_LOAD=0 always takes the normal chunked path
+BULK_LOAD = os.getenv('DB_BULK_LOAD', '1') != '0'
+
+
+def table_is_empty(connection):
+    """True if user_data holds no rows (None if it can't be read)."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM user_data LIMIT 1")
+        return cursor.fetchone() is None
+    except Error:
+        return None
+    finally:
+        cursor.close()
+
+
+def _load_sqlite(connection, chunks):
+    """Single-transaction path with relaxed durability. Returns (inserted, skipped)."""
+    cursor = connection.cursor()
+    try:
+        connection.commit()  # Pragmas below can't change inside a transaction
+        cursor.execute("PRAGMA synchronous")
+        synchronous = cursor.fetchone()[0]
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+        # A crash mid-load can only lose this load, which starts over on
+        # an empty table, so durability is traded for speed until commit
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.fetchone()
+
+        insert_query = (f"{get_driver().insert_ignore} INTO user_data "
+                        "(user_id, name, email, age) VALUES (%s, %s, %s, %s)")
+        inserted = written = 0
+        # Earlier rows are visible inside the transaction, so hits can be confirmed
+        deduper = EmailDeduper(confirm=lambda emails: existing_emails(cursor, emails))
+        try:
+            for chunk in chunks:
+                chunk = deduper.filter(chunk)
+                if not chunk:
+                    continue
+                cursor.executemany(insert_query, [(new_user_id(), name, email, age)
+                                                  for name, email, age in chunk])
+                inserted += max(cursor.rowcount, 0)
+                written += len(chunk)
+            connection.commit()
+        except Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            cursor.fetchone()
+            cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        deduper.report()
+        return inserted, written - inserted + deduper.duplicates
+    finally:
+        cursor.close()
+
+
+def _after_load(connection, csv_file):
+    """
+    Housekeeping once the rows are committed. A failure here is reported
+    but doesn't undo the load, so the caller still gets the real counts.
+    """
+    try:
+        rebuild_stats(connection)
+    except Error as e:
+        connection.rollback()
+        print(f"Rows loaded, but rebuilding user_data_stats failed ({e}); "
+              "run 'python user_stats.py rebuild'.")
+
+    # A leftover checkpoint belongs to rows that are no longer there
+    create_checkpoint_table(connection)
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        clear_checkpoint(cursor, csv_file)
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        print(f"Rows loaded, but clearing the ingest checkpoint failed ({e}); "
+              f"run 'python ingest_checkpoint.py clear {csv_file}'.")
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def bulk_load(connection, csv_file, chunk_size, workers=1):
+    """
+    Loads 'csv_file' into an empty user_data table through the backend's
+    bulk path. Returns (inserted, skipped), or None if the caller should
+    use the normal path instead.
+    """
+    if get_driver().name != 'sqlite':
+        return None
+    if not BULK_LOAD or not table_is_empty(connection) or not os.path.exists(csv_file):
+        return None
+    seed = __import__('seed')
+    if workers > 1:
+        chunks = seed.load_data_from_csv_parallel(csv_file, workers, chunk_size)
+    else:
+        chunks = seed.load_data_from_csv(csv_file, chunk_size)
+
+    started = time.perf_counter()
+    dropped = drop_indexes(connection)
+    try:
+        result = _load_sqlite(connection, chunks)
+    finally:
+        chunks.close()
+        if dropped:
+            create_indexes(connection)
+    if result is None:
+        return None
+    _after_load(connection, csv_file)
+
+    inserted, skipped = result
+    print(f"Bulk-loaded {inserted} rows in {time.perf_counter() - started:.2f}s.")
+    if skipped:
+        print(f"Skipped {skipped} rows (email already exists).")
+    return result
@@ -0,0 +1,257 @@
+#!/usr/bin/python3
+"""
+This module contains an incremental change stream over user_data, so
+downstream caches can process deltas instead of re-reading the table.
+
+enable_change_tracking() adds an updated_at column, kept current by
+MySQL itself (ON UPDATE CURRENT_TIMESTAMP(6)) or by triggers on SQLite,
+and an (updated_at, user_id) index. stream_changes() then yields, batch
+by batch, the rows written after a consumer's watermark (the updated_at
+and user_id of the last row it was handed) with a keyset query on that
+index, so each poll costs an index seek however large the table is.
+
+The watermark is saved in user_data_watermarks when the consumer asks
+for the next batch. A restarted consumer resumes where it left off, and
+a batch it was still working on is delivered again (at least once).
+
+A row is only read once its updated_at is CHANGE_SETTLE_SECONDS old:
+transactions don't always commit in timestamp order, and a row stamped
+before the watermark but committed after it would otherwise be skipped
+for good. A write left uncommitted for longer than that can still be
+missed. Deletes are not reported.
+
+    python change_stream.py enable
+    python change_stream.py follow [CONSUMER]
+    python change_stream.py show | reset CONSUMER
+"""
+import datetime
+import os
+import sys
+import time
+from db_driver import Error, get_driver
+from db_pool import connect_to_prodev
+from user_ids import user_id_param
+from user_indexes import create_indexes
+from user_rows import USER_COLUMNS, USER_SELECT_LIST, row_factory
+
+CHANGE_COLUMN = 'updated_at'
+CHANGE_INDEXES = {'idx_user_data_updated_at': (CHANGE_COLUMN, 'user_id')}
+# How old a write must be before it is streamed (see the module docstring)
+CHANGE_SETTLE_SECONDS = float(os.getenv('CHANGE_SETTLE_SECONDS', '2'))
+CHANGE_BATCH_SIZE = 1000
+# Pause after an empty poll; it doubles up to MAX_POLL_INTERVAL while idle
+POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 30.0
+
+CREATE_WATERMARK_TABLE = """
+CREATE TABLE IF NOT EXISTS user_data_watermarks (
+    consumer VARCHAR(255) PRIMARY KEY,
+    updated_at VARCHAR(32) NOT NULL,
+    user_id VARCHAR(36) NOT NULL
+);
+"""
+
+
+def change_tracking_enabled(connection):
+    """True if user_data has the updated_at column."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT {CHANGE_COLUMN} FROM user_data LIMIT 1")
+        cursor.fetchall()
+        return True
+    except Error:
+        return False
+    finally:
+        cursor.close()
+
+
+def enable_change_tracking(connection):
+    """
+    Adds updated_at (existing rows are stamped with the current time),
+    its index and the watermark table. Safe to run again. Returns True
+    on success.
+    """
+    driver = get_driver()
+    cursor = None
+    try:
+        added = not change_tracking_enabled(connection)
+        cursor = connection.cursor()
+        if added:
+            cursor.execute(f"ALTER TABLE user_data ADD COLUMN {CHANGE_COLUMN} "
+                           f"{driver.updated_at_column}")
+        for statement in driver.touch_statements('user_data', CHANGE_COLUMN, USER_COLUMNS):
+            cursor.execute(statement)
+        cursor.execute(CREATE_WATERMARK_TABLE)
+        connection.commit()
+        if added:
+            print(f"Column '{CHANGE_COLUMN}' added to 'user_data'.")
+    except Error as e:
+        connection.rollback()
+        print(f"Error enabling change tracking: {e}")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+    create_indexes(connection, CHANGE_INDEXES)
+    return True
+
+
+# --- Watermarks ---
+def _timestamp_text(value):
+    """updated_at as the text stored in watermarks (MySQL returns datetimes)."""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ', timespec='microseconds')
+    return str(value)
+
+
+def read_watermark(connection, consumer):
+    """Returns (updated_at, user_id) last saved for 'consumer', or None."""
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT updated_at, user_id FROM user_data_watermarks "
+                       "WHERE consumer = %s", (consumer,))
+        row = cursor.fetchone()
+    except Error as e:
+        print(f"Error reading watermark: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+    return None if row is None else (row[0], row[1])
+
+
+def save_watermark(cursor, consumer, updated_at, user_id):
+    """Records the watermark of 'consumer'. Does NOT commit."""
+    driver = get_driver()
+    cursor.execute(
+        "INSERT INTO user_data_watermarks (consumer, updated_at, user_id) "
+        f"VALUES (%s, %s, %s) {driver.upsert('consumer')} "
+        f"updated_at = {driver.new_value('updated_at')}, "
+        f"user_id = {driver.new_value('user_id')}",
+        (consumer, updated_at, user_id))
+
+
+def reset_watermark(cursor, consumer):
+    """Forgets the watermark of 'consumer', which then starts from the beginning."""
+    cursor.execute("DELETE FROM user_data_watermarks WHERE consumer = %s", (consumer,))
+
+
+# --- Streaming ---
+def _changes_query(watermark, batch_size, settle):
+    """The next batch after 'watermark' (None: from the start). Returns (sql, params)."""
+    conditions = [f"{CHANGE_COLUMN} <= {get_driver().timestamp_ago(settle)}"]
+    params = ()
+    if watermark is not None:
+        updated_at, user_id = watermark
+        conditions.insert(0, f"({CHANGE_COLUMN} > %s OR ({CHANGE_COLUMN} = %s "
+                             "AND user_data.user_id > %s))")
+        params = (updated_at, updated_at, user_id_param(user_id))
+    query = (f"SELECT {USER_SELECT_LIST}, {CHANGE_COLUMN} FROM user_data "
+             f"WHERE {' AND '.join(conditions)} "
+             f"ORDER BY {CHANGE_COLUMN}, user_data.user_id LIMIT %s")
+    return query, params + (batch_size,)
+
+
+def stream_changes(consumer='default', batch_size=CHANGE_BATCH_SIZE, follow=True,
+                   poll_interval=POLL_INTERVAL, max_poll_interval=MAX_POLL_INTERVAL,
+                   settle=CHANGE_SETTLE_SECONDS, row_format='dict'):
+    """
+    Generator that yields lists of the user_data rows inserted or updated
+    since the watermark of 'consumer', oldest first, in 'row_format'.
+
+    Asking for the next batch saves the watermark of the previous one.
+    A full batch is followed at once by the next poll. Once caught up,
+    follow=True keeps polling: it sleeps 'poll_interval' seconds,
+    doubling the pause up to 'max_poll_interval' while nothing changes.
+    follow=False returns instead, for one-off incremental syncs.
+    """
+    make_row = row_factory(row_format)
+    connection = None
+    cursor = None
+    try:
+        connection = connect_to_prodev()
+        if connection is None:
+            print("Failed to connect to the database. Aborting.")
+            return
+
+        watermark = read_watermark(connection, consumer)
+        pause = poll_interval
+        while True:
+            cursor = connection.cursor()
+            query, params = _changes_query(watermark, batch_size, settle)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.close()
+            cursor = None
+            # Ends the read transaction; under REPEATABLE READ the next
+            # poll would otherwise keep seeing this snapshot
+            connection.commit()
+
+            if rows:
+                pause = poll_interval
+                last = rows[-1]
+                batch = [row[:-1] for row in rows]
+                yield batch if make_row is None else list(map(make_row, batch))
+
+                # Back for more, so the consumer is done with that batch
+                watermark = (_timestamp_text(last[-1]), last[0])
+                cursor = connection.cursor()
+                save_watermark(cursor, consumer, *watermark)
+                connection.commit()
+                cursor.close()
+                cursor = None
+                if len(rows) == batch_size:
+                    continue
+
+            if not follow:
+                return
+            time.sleep(pause)
+            pause = min(pause * 2, max_poll_interval)
+
+    except Error as e:
+        print(f"Error streaming changes: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+        if connection and connection.is_connected():
+            connection.close()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('enable', 'follow', 'show', 'reset') or (
+            command == 'reset' and len(sys.argv) < 3):
+        print("Usage: python change_stream.py enable | follow [CONSUMER] | show | reset CONSUMER")
+        sys.exit(2)
+
+    if command == 'follow':
+        consumer = sys.argv[2] if len(sys.argv) > 2 else 'default'
+        try:
+            for changes in stream_changes(consumer):
+                for user in changes:
+                    print(f"{user['user_id']}: {user['name']} <{user['email']}> ({user['age']})")
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    cursor = connection.cursor()
+    try:
+        if command == 'enable':
+            enable_change_tracking(connection)
+        elif command == 'show':
+            cursor.execute("SELECT consumer, updated_at, user_id FROM user_data_watermarks")
+            for consumer, updated_at, user_id in cursor.fetchall():
+                print(f"{consumer}: {updated_at} / {user_id}")
+        else:
+            reset_watermark(cursor, sys.argv[2])
+            connection.commit()
+    except Error as e:
+        print(f"Error: {e}")
+    finally:
+        cursor.close()
+        connection.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+"""
+This module contains columnar batches of user_data and the predicates
+used to filter them.
+
+A ColumnBatch holds one array per column instead of one dict per row.
+With NumPy installed the columns are ndarrays and filters run as
+vectorized boolean masks; without it, the standard 'array' module is
+used for numeric columns and plain lists for strings.
+
+A Predicate such as Predicate('age', '>', 25) can either be pushed into
+the SQL WHERE clause (where_clause) or applied to a fetched batch
+(ColumnBatch.filter / Predicate.matches).
+
+A ColumnBatch pickles compactly, which matters when batches are sent
+to worker processes: numeric columns as their raw bytes, and each
+string column as one NUL-separated UTF-8 blob, rather than one
+pickled object per value. Packing and unpacking are then a few C-level
+joins and splits instead of a Python loop over the rows.
+"""
+import operator
+from array import array
+from itertools import compress
+from user_rows import USER_COLUMNS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to the array module
+    np = None
+
+OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Numeric columns and their compact storage ('array' typecode, NumPy dtype)
+NUMERIC_COLUMNS = {'age': ('h', 'int16')}
+
+# Joins a string column into one blob when a batch is pickled
+_SEPARATOR = '\x00'
+
+
+class Predicate:
+    """A single 'column op value' filter on user_data."""
+    __slots__ = ('column', 'op', 'value')
+
+    def __init__(self, column, op, value):
+        if column not in USER_COLUMNS:
+            raise ValueError(f"Unknown column {column!r}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator {op!r}")
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def __repr__(self):
+        return f"Predicate({self.column!r}, {self.op!r}, {self.value!r})"
+
+    def sql(self):
+        """Returns the SQL condition and its parameters."""
+        # Column and operator are whitelisted above; the value is bound
+        return f"{self.column} {self.op} %s", (self.value,)
+
+    def matches(self, row):
+        """Tests one row (dict, UserRecord or anything indexable by name)."""
+        return OPERATORS[self.op](row[self.column], self.value)
+
+    def mask(self, batch):
+        """Evaluates the predicate over a whole ColumnBatch at once."""
+        column = batch[self.column]
+        compare = OPERATORS[self.op]
+        if np is not None and isinstance(column, np.ndarray):
+            return compare(column, self.value)
+        return [compare(value, self.value) for value in column]
+
+
+def where_clause(predicates):
+    """ANDs predicates into one SQL condition. Returns (sql, params)."""
+    conditions, params = [], []
+    for predicate in predicates:
+        condition, values = predicate.sql()
+        conditions.append(condition)
+        params.extend(values)
+    return " AND ".join(conditions), tuple(params)
+
+
+def _numeric_column(values, typecode, dtype, use_numpy):
+    # Ages come back as Decimal(3, 0); store them as small ints
+    if use_numpy:
+        return np.fromiter((int(v) for v in values), dtype=dtype, count=len(values))
+    return array(typecode, (int(v) for v in values))
+
+
+def _string_column(values, use_numpy):
+    if use_numpy:
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    return list(values)
+
+
+class ColumnBatch:
+    """
+    A batch of user_data rows stored column by column.
+    batch['age'] returns the whole age column; len(batch) is the row count.
+    """
+    __slots__ = ('columns', 'length')
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_rows(cls, rows, names=USER_COLUMNS, use_numpy=None):
+        """
+        Builds a batch from tuples in 'names' order (a plain cursor's rows).
+        'use_numpy' defaults to whether NumPy is installed.
+        """
+        values_by_name = zip(*rows) if rows else ([] for _ in names)
+        return cls.from_columns(dict(zip(names, values_by_name)), len(rows), use_numpy)
+
+    @classmethod
+    def from_columns(cls, values_by_name, length, use_numpy=None):
+        """
+        Builds a batch from {name: sequence of values}. A numeric column
+        that already has its compact storage (an ndarray or array of the
+        right type) is kept as is rather than copied.
+        """
+        if use_numpy is None:
+            use_numpy = np is not None
+        columns = {}
+        for name, values in values_by_name.items():
+            if name in NUMERIC_COLUMNS:
+                typecode, dtype = NUMERIC_COLUMNS[name]
+                if use_numpy and isinstance(values, np.ndarray) and values.dtype == dtype:
+                    columns[name] = values
+                elif not use_numpy and isinstance(values, array) and values.typecode == typecode:
+                    columns[name] = values
+                else:
+                    columns[name] = _numeric_column(values, typecode, dtype, use_numpy)
+            else:
+                columns[name] = _string_column(values, use_numpy)
+        return cls(columns, length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __repr__(self):
+        return f"ColumnBatch({len(self)} rows, columns={list(self.columns)})"
+
+    def __getstate__(self):
+        packed = {}
+        for name, column in self.columns.items():
+            if name in NUMERIC_COLUMNS:
+                typecode, dtype = NUMERIC_COLUMNS[name]
+                if np is not None and isinstance(column, np.ndarray):
+                    packed[name] = column.astype(dtype, copy=False).tobytes()
+                else:
+                    packed[name] = array(typecode, column).tobytes()
+                continue
+            joined = _SEPARATOR.join(column)
+            if joined.count(_SEPARATOR) == max(len(column) - 1, 0):
+                packed[name] = joined.encode('utf-8')
+            else:
+                # A value contains the separator itself: pickle the values as is
+                packed[name] = list(column)
+        return packed, self.length
+
+    def __setstate__(self, state):
+        packed, self.length = state
+        self.columns = {}
+        use_numpy = np is not None
+        for name, data in packed.items():
+            if name in NUMERIC_COLUMNS:
+                typecode, dtype = NUMERIC_COLUMNS[name]
+                if use_numpy:
+                    # Copied so the batch is writable, like a freshly built one
+                    self.columns[name] = np.frombuffer(data, dtype=dtype).copy()
+                else:
+                    column = array(typecode)
+                    column.frombytes(data)
+                    self.columns[name] = column
+                continue
+            if isinstance(data, bytes):
+                data = data.decode('utf-8').split(_SEPARATOR) if self.length else []
+            self.columns[name] = _string_column(data, use_numpy)
+
+    def filter(self, predicates):
+        """Returns a new batch with only the rows matching every predicate."""
+        mask = None
+        for predicate in predicates:
+            current = predicate.mask(self)
+            if mask is None:
+                mask = current
+            elif np is not None and isinstance(mask, np.ndarray):
+                mask = mask & current
+            else:
+                mask = [a and b for a, b in zip(mask, current)]
+        if mask is None:
+            return self
+
+        columns = {}
+        for name, column in self.columns.items():
+            if np is not None and isinstance(column, np.ndarray):
+                columns[name] = column[mask]
+            elif isinstance(column, array):
+                columns[name] = array(column.typecode, compress(column, mask))
+            else:
+                columns[name] = list(compress(column, mask))
+        length = int(mask.sum()) if hasattr(mask, 'sum') else sum(mask)
+        return ColumnBatch(columns, length)
+
+    def rows(self):
+        """Iterates the batch back as dicts, e.g. for printing."""
+        names = list(self.columns)
+        for values in zip(*(self.columns[name] for name in names)):
+            yield dict(zip(names, values))
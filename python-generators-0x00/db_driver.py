@@ -0,0 +1,397 @@
+#!/usr/bin/python3
+"""
+This module contains the thin driver layer that lets the generators run
+on MySQL (mysql.connector) or on a local SQLite file.
+
+Pick the backend with the DB_BACKEND environment variable:
+
+    DB_BACKEND=mysql   (default) uses DB_HOST / DB_USER / DB_PASS
+    DB_BACKEND=sqlite  uses the file named by DB_PATH
+
+The rest of the package keeps writing MySQL-flavoured DB-API code:
+'%s' placeholders, cursor(dictionary=True), is_connected(). For SQLite
+the connection is wrapped so those calls keep working, and the few
+statements whose syntax really differs ask the driver for it
+(insert_ignore, upsert, least/greatest, integer division, binary keys,
+string concatenation).
+
+Only this package goes through the driver. The decorator and
+context-manager exercises are standalone SQLite scripts (see README).
+"""
+import hashlib
+import os
+import sqlite3
+import uuid
+
+try:
+    import mysql.connector
+except ImportError:  # Not needed when DB_BACKEND=sqlite
+    mysql = None
+
+# --- Database Configuration ---
+# Read from environment variables for security
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_USER = os.getenv('DB_USER')
+DB_PASS = os.getenv('DB_PASS')
+DB_NAME = 'ALX_prodev'
+DB_PATH = os.getenv('DB_PATH', f'{DB_NAME}.db')
+
+
+class DriverError(Exception):
+    """Raised by this package itself, e.g. when no connection could be made."""
+
+
+# Catch-all for 'except Error' whichever backend is in use
+Error = (DriverError, sqlite3.Error)
+if mysql is not None:
+    Error += (mysql.connector.Error,)
+
+
+# --- SQLite adapter ---
+def _qmark(query):
+    """Rewrites the package's '%s' placeholders to SQLite's '?'."""
+    return query.replace('%s', '?')
+
+
+def _bin_to_uuid(value):
+    return None if value is None else str(uuid.UUID(bytes=bytes(value)))
+
+
+def _uuid_to_bin(value):
+    return None if value is None else uuid.UUID(value).bytes
+
+
+def _md5(value):
+    if value is None:
+        return None
+    if not isinstance(value, (bytes, bytearray)):
+        value = str(value).encode('utf-8')
+    return hashlib.md5(value).hexdigest()
+
+
+_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _conv(value, from_base, to_base):
+    """MySQL's CONV() for non-negative numbers; returns a string like MySQL."""
+    if value is None:
+        return None
+    number, to_base = int(str(value), int(from_base)), int(to_base)
+    text = ''
+    while True:
+        number, digit = divmod(number, to_base)
+        text = _DIGITS[digit] + text
+        if not number:
+            return text
+
+
+# MySQL built-ins that SQLite lacks, as Python functions
+MYSQL_FUNCTIONS = {'BIN_TO_UUID': _bin_to_uuid, 'UUID_TO_BIN': _uuid_to_bin,
+                   'MD5': _md5, 'CONV': _conv}
+
+
+class SQLiteCursor:
+    """A sqlite3 cursor that accepts '%s' placeholders and can return dicts."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._columns = None
+
+    def execute(self, query, params=()):
+        self._cursor.execute(_qmark(query), params)
+        description = self._cursor.description
+        self._columns = [d[0] for d in description] if description else None
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(_qmark(query), seq_of_params)
+        return self
+
+    def _shape(self, row):
+        if self._dictionary and row is not None:
+            return dict(zip(self._columns, row))
+        return row
+
+    def fetchone(self):
+        return self._shape(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        return [self._shape(row) for row in rows] if self._dictionary else rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        return [self._shape(row) for row in rows] if self._dictionary else rows
+
+    def __iter__(self):
+        return map(self._shape, self._cursor) if self._dictionary else iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    A sqlite3 connection with the mysql.connector methods the package
+    relies on. SQLite cursors step through results lazily, so every
+    cursor already streams; 'buffered' is accepted and ignored.
+    """
+    unread_result = False
+
+    def __init__(self, path):
+        # Pooled connections may be borrowed by different threads, one at a time
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._open = True
+        register_mysql_functions(self._connection)
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._connection.cursor(), dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self):
+        self._connection.execute("SELECT 1")
+
+    def is_connected(self):
+        return self._open
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        self._open = False
+        self._connection.close()
+
+
+def register_mysql_functions(connection):
+    """
+    Adds MySQL's BIN_TO_UUID()/UUID_TO_BIN(), MD5() and CONV() to a
+    SQLite connection, so queries on BINARY(16) user_ids and
+    hash-sampled queries read the same on both backends.
+    Works on anything with sqlite3's create_function().
+    """
+    for name, function in MYSQL_FUNCTIONS.items():
+        connection.create_function(name, -1, function, deterministic=True)
+
+
+# --- Drivers ---
+class Driver:
+    """What differs between backends: how to connect and a few SQL spellings."""
+    name = None
+    paramstyle = 'format'  # '%s' in the package's SQL, whatever the backend
+    insert_ignore = "INSERT IGNORE"
+    least = "LEAST"
+    greatest = "GREATEST"
+    binary_id_type = "BINARY(16)"
+    # A dense integer that addresses rows directly, if the backend has one
+    row_locator = None
+
+    def connect(self, database=True):
+        raise NotImplementedError
+
+    def sql(self, query):
+        """Adapts the package's '%s' placeholders to this backend's paramstyle."""
+        return query
+
+    def int_div(self, expression, divisor):
+        """SQL for the integer part of 'expression / divisor'."""
+        return f"FLOOR({expression} / {divisor})"
+
+    def concat(self, *parts):
+        """SQL that joins the string expressions 'parts'."""
+        return f"CONCAT({', '.join(parts)})"
+
+    def upsert(self, key):
+        """Start of the clause that turns an INSERT into an update on 'key' conflicts."""
+        return "ON DUPLICATE KEY UPDATE"
+
+    def new_value(self, column):
+        """How an upsert refers to the value the INSERT tried to write."""
+        return f"VALUES({column})"
+
+    def rename_tables(self, renames):
+        """Statements that rename each (old, new) pair, all or none."""
+        pairs = ', '.join(f"{old} TO {new}" for old, new in renames)
+        return [f"RENAME TABLE {pairs}"]
+
+    def create_index(self, name, table, columns):
+        """Builds an index online: reads and writes carry on meanwhile."""
+        return (f"CREATE INDEX {name} ON {table} ({', '.join(columns)}) "
+                "ALGORITHM=INPLACE LOCK=NONE")
+
+    def drop_index(self, name, table):
+        return f"DROP INDEX {name} ON {table}"
+
+    def analyze(self, table):
+        """Refreshes the planner's statistics for 'table'."""
+        return f"ANALYZE TABLE {table}"
+
+    # Definition of a column holding the time each row was last written.
+    # MySQL maintains it itself on INSERT and UPDATE.
+    updated_at_column = ("TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+                         "ON UPDATE CURRENT_TIMESTAMP(6)")
+
+    def touch_statements(self, table, column, watched):
+        """
+        Statements that make 'column' follow inserts and updates of the
+        'watched' columns, beyond what its definition already does.
+        """
+        return []
+
+    def untouch_statements(self, table, column):
+        """Statements that undo touch_statements() for 'table' and 'column'."""
+        return []
+
+    def timestamp_ago(self, seconds):
+        """SQL for the server's current time minus 'seconds', comparable with updated_at."""
+        return f"NOW(6) - INTERVAL {float(seconds)} SECOND"
+
+    # Names of the secondary indexes on the table named by the one parameter
+    index_names_query = (
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'"
+    )
+
+    # (data bytes, index bytes) of the table named by the one parameter.
+    # InnoDB counts the clustered primary key as data.
+    table_size_query = (
+        "SELECT DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    )
+
+
+class MySQLDriver(Driver):
+    name = 'mysql'
+
+    def connect(self, database=True):
+        """
+        Opens a new connection, to the ALX_prodev database or (with
+        database=False) to the server only. Returns None on failure.
+        """
+        if mysql is None:
+            print("Error: mysql-connector-python is not installed.")
+            return None
+        if not DB_USER or not DB_PASS:
+            print("Error: DB_USER and DB_PASS environment variables are not set.")
+            return None
+
+        options = {'host': DB_HOST, 'user': DB_USER, 'password': DB_PASS}
+        if database:
+            options['database'] = DB_NAME
+        try:
+            return mysql.connector.connect(**options)
+        except mysql.connector.Error as e:
+            print(f"Error connecting to MySQL: {e}")
+            return None
+
+
+class SQLiteDriver(Driver):
+    name = 'sqlite'
+    insert_ignore = "INSERT OR IGNORE"
+    # SQLite's multi-argument min()/max() are scalar, like LEAST/GREATEST
+    least = "MIN"
+    greatest = "MAX"
+    binary_id_type = "BLOB"
+    row_locator = "rowid"
+
+    def connect(self, database=True):
+        """Opens the SQLite file (one file is both server and database)."""
+        try:
+            return SQLiteConnection(DB_PATH)
+        except sqlite3.Error as e:
+            print(f"Error opening SQLite database '{DB_PATH}': {e}")
+            return None
+
+    def sql(self, query):
+        return _qmark(query)
+
+    def int_div(self, expression, divisor):
+        return f"CAST({expression} / {divisor} AS INTEGER)"
+
+    def concat(self, *parts):
+        return f"({' || '.join(parts)})"
+
+    def upsert(self, key):
+        return f"ON CONFLICT({key}) DO UPDATE SET"
+
+    def new_value(self, column):
+        return f"excluded.{column}"
+
+    def rename_tables(self, renames):
+        # One ALTER per table, wrapped in an explicit transaction because
+        # sqlite3 does not open one implicitly for DDL
+        return (["BEGIN"] + [f"ALTER TABLE {old} RENAME TO {new}" for old, new in renames]
+                + ["COMMIT"])
+
+    def create_index(self, name, table, columns):
+        # SQLite has no online DDL; the build holds the write lock. No IF
+        # NOT EXISTS: index names are global here, and one left on another
+        # table (e.g. user_data_char36) must fail rather than be skipped
+        return f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+
+    def drop_index(self, name, table):
+        return f"DROP INDEX IF EXISTS {name}"
+
+    def analyze(self, table):
+        return f"ANALYZE {table}"
+
+    # ALTER TABLE ... ADD COLUMN only takes a constant default, so
+    # triggers stamp the rows instead (touch_statements)
+    updated_at_column = "TEXT NOT NULL DEFAULT ''"
+
+    def touch_statements(self, table, column, watched):
+        now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+        # recursive_triggers is off, so the triggers' own UPDATE doesn't re-fire them
+        return [
+            f"UPDATE {table} SET {column} = {now} WHERE {column} = ''",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_insert AFTER INSERT ON {table} "
+            f"BEGIN UPDATE {table} SET {column} = {now} WHERE rowid = NEW.rowid; END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_update "
+            f"AFTER UPDATE OF {', '.join(watched)} ON {table} "
+            f"BEGIN UPDATE {table} SET {column} = {now} WHERE rowid = NEW.rowid; END",
+        ]
+
+    def untouch_statements(self, table, column):
+        return [f"DROP TRIGGER IF EXISTS {table}_{column}_{event}"
+                for event in ('insert', 'update')]
+
+    def timestamp_ago(self, seconds):
+        return f"strftime('%Y-%m-%d %H:%M:%f', 'now', '-{float(seconds)} seconds')"
+
+    index_names_query = (
+        "SELECT name FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL"
+    )
+
+    # Needs SQLite built with the dbstat virtual table (the default in CPython)
+    table_size_query = (
+        "SELECT SUM(CASE WHEN s.name = m.tbl_name THEN s.pgsize ELSE 0 END), "
+        "SUM(CASE WHEN s.name <> m.tbl_name THEN s.pgsize ELSE 0 END) "
+        "FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+        "WHERE m.tbl_name = %s"
+    )
+
+
+DRIVERS = {'mysql': MySQLDriver(), 'sqlite': SQLiteDriver()}
+
+
+def get_driver():
+    """Returns the driver selected by DB_BACKEND."""
+    try:
+        return DRIVERS[DB_BACKEND]
+    except KeyError:
+        raise DriverError(f"Unknown DB_BACKEND {DB_BACKEND!r}; use one of {list(DRIVERS)}")
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+"""
+This module contains the shared, bounded connection pool for the
+ALX_prodev database.
+
+Every stream/paginate/ingest function borrows its connection from here
+instead of opening a new one, so short jobs don't pay TCP + auth setup
+on each call. A borrowed connection is returned to the pool by calling
+close() on it, exactly as the callers already do.
+"""
+import os
+import threading
+import time
+from collections import deque
+from db_driver import DriverError, get_driver
+
+# --- Pool Configuration ---
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+# Idle connections older than this (seconds) are closed instead of reused
+POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))
+# How long (seconds) a checkout waits for a free slot before giving up
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+
+def open_connection():
+    """
+    Opens a brand new, unpooled connection to the ALX_prodev database on
+    the configured backend (see db_driver.py). Returns None on failure.
+    """
+    return get_driver().connect()
+
+
+class PooledConnection:
+    """
+    A borrowed connection. Everything is delegated to the real connection,
+    except close(), which hands it back to the pool.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise DriverError("Connection has already been returned to the pool.")
+        return getattr(self._connection, name)
+
+    def is_connected(self):
+        return self._connection is not None and self._connection.is_connected()
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections.
+
+    - At most 'size' connections are checked out at once; further
+      checkouts wait up to 'timeout' seconds for one to come back.
+    - Each connection is pinged on checkout and replaced if it died.
+    - Connections idle for more than 'max_idle' seconds are reaped.
+    """
+
+    def __init__(self, connect=open_connection, size=POOL_SIZE,
+                 max_idle=POOL_MAX_IDLE, timeout=POOL_TIMEOUT):
+        self._connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = deque()  # (connection, returned_at), newest on the right
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        """
+        Borrows a live connection from the pool, opening one if none is idle.
+        Returns None if the pool is exhausted or the database is unreachable.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            print(f"Error: no free connection in the pool after {self.timeout}s.")
+            return None
+
+        self.reap_idle()
+        while True:
+            with self._lock:
+                connection = self._idle.pop()[0] if self._idle else None
+            if connection is None:
+                break
+            if self._is_alive(connection):
+                return PooledConnection(self, connection)
+            self._discard(connection)
+
+        connection = self._connect()
+        if connection is None:
+            self._slots.release()
+            return None
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """Takes a connection back. Any open transaction is rolled back."""
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+        else:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def reap_idle(self):
+        """Closes idle connections that have not been used for 'max_idle' seconds."""
+        cutoff = time.monotonic() - self.max_idle
+        expired = []
+        with self._lock:
+            # Oldest connections sit on the left
+            while self._idle and self._idle[0][1] < cutoff:
+                expired.append(self._idle.popleft()[0])
+        for connection in expired:
+            self._discard(connection)
+        return len(expired)
+
+    def close_all(self):
+        """Closes every idle connection. Borrowed ones close when returned."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    @staticmethod
+    def _is_alive(connection):
+        try:
+            connection.ping()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def connect_to_prodev():
+    """
+    Borrows a connection to the ALX_prodev database from the shared pool.
+    Call close() on it when done to return it to the pool.
+    """
+    return get_pool().acquire()
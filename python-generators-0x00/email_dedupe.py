@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""
+This module contains the in-stream duplicate-email filter used while
+loading a CSV into user_data.
+
+Emails are first remembered exactly, in a set. Once DEDUPE_EXACT_LIMIT
+of them have been seen, the set is folded into a sketches.BloomFilter
+and thrown away, so memory stays bounded however many rows the file
+has. A Bloom hit may be a false positive, so the suspected duplicates
+of each chunk are confirmed against the rows already written to
+user_data before they are rejected.
+"""
+import os
+from sketches import BloomFilter
+
+# Emails held exactly before switching to the Bloom filter
+DEDUPE_EXACT_LIMIT = int(os.getenv('DEDUPE_EXACT_LIMIT', '200000'))
+# Emails the Bloom filter is sized for (about 24 MB at 1%)
+DEDUPE_CAPACITY = int(os.getenv('DEDUPE_CAPACITY', '20000000'))
+DEDUPE_ERROR_RATE = 0.01
+
+# Emails per confirmation query, below SQLite's oldest bound-parameter limit
+CONFIRM_BATCH_SIZE = 500
+
+
+def existing_emails(cursor, emails):
+    """Returns the subset of 'emails' already present in user_data."""
+    found = set()
+    emails = list(emails)
+    for start in range(0, len(emails), CONFIRM_BATCH_SIZE):
+        batch = emails[start:start + CONFIRM_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(f"SELECT email FROM user_data WHERE email IN ({placeholders})",
+                       tuple(batch))
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+class EmailDeduper:
+    """
+    Drops (name, email, age) rows whose email already appeared earlier in
+    the stream.
+
+    'confirm' is called with the suspected duplicates of a chunk and
+    returns those that really exist (see existing_emails). Without it,
+    suspects are let through and left to the UNIQUE index.
+    """
+
+    def __init__(self, confirm=None, exact_limit=DEDUPE_EXACT_LIMIT,
+                 capacity=DEDUPE_CAPACITY, error_rate=DEDUPE_ERROR_RATE):
+        self.confirm = confirm
+        self.exact_limit = exact_limit
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.seen = set()
+        self.bloom = None
+        self.duplicates = 0        # Rows rejected as repeats
+        self.confirmations = 0     # Suspects looked up in the database
+        self.false_positives = 0   # Suspects the database cleared
+
+    def filter(self, rows):
+        """Returns the rows of one chunk whose email is new."""
+        if self.bloom is None:
+            kept = []
+            for row in rows:
+                if row[1] in self.seen:
+                    self.duplicates += 1
+                else:
+                    self.seen.add(row[1])
+                    kept.append(row)
+            if len(self.seen) > self.exact_limit:
+                self._spill()
+            return kept
+        return self._filter_bloom(rows)
+
+    def _spill(self):
+        """Moves the exact set into a Bloom filter."""
+        self.bloom = BloomFilter(max(self.capacity, 2 * len(self.seen)), self.error_rate)
+        for email in self.seen:
+            self.bloom.add(email)
+        self.seen = None
+
+    def _filter_bloom(self, rows):
+        kept, suspects = [], []
+        # This chunk's rows aren't written yet, so the database can't
+        # confirm repeats within it; an exact set per chunk does
+        in_chunk = set()
+        for row in rows:
+            email = row[1]
+            if email in in_chunk:
+                self.duplicates += 1
+                continue
+            in_chunk.add(email)
+            if self.bloom.add(email):
+                suspects.append(row)
+            else:
+                kept.append(row)
+
+        if suspects and self.confirm is not None:
+            self.confirmations += len(suspects)
+            existing = self.confirm(row[1] for row in suspects)
+            for row in suspects:
+                if row[1] in existing:
+                    self.duplicates += 1
+                else:
+                    self.false_positives += 1
+                    kept.append(row)
+        else:
+            kept.extend(suspects)
+        return kept
+
+    def report(self):
+        """Prints what was rejected, if anything."""
+        if self.duplicates:
+            print(f"Rejected {self.duplicates} duplicate emails before inserting.")
+        if self.confirmations:
+            print(f"Checked {self.confirmations} Bloom filter hits against the database "
+                  f"({self.false_positives} were false positives).")
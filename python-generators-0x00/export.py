@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+"""
+This module contains the chunked export of user_data to NDJSON, CSV or
+Parquet files.
+
+Rows are streamed from seed.stream_user_data on an unbuffered cursor,
+encoded one batch at a time and handed to a writer thread through a
+bounded queue. When the disk (or the compressor) is slower than the
+database the queue fills up and the reader blocks: that is the
+backpressure that keeps memory constant however many rows are exported.
+
+    python export.py users.ndjson.gz ndjson gzip
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from itertools import islice
+from db_driver import DriverError
+from db_pool import connect_to_prodev
+from prefetch import put_until_stopped
+from user_rows import USER_COLUMNS
+
+seed = __import__('seed')
+
+try:
+    import zstandard
+except ImportError:  # Only needed for compression='zstd' on text formats
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Only needed for fmt='parquet'
+    pyarrow = None
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'parquet')
+EXPORT_BATCH_SIZE = 10000
+# Bytes buffered in front of the file before each write() call
+WRITE_BUFFER_BYTES = 1024 * 1024
+# Encoded batches allowed to wait for the writer thread
+WRITE_QUEUE_SIZE = 4
+
+_DONE = object()  # Tells the writer thread there is nothing left
+
+
+# --- Encoders: one batch of row tuples -> a payload for the sink ---
+def _encode_ndjson(rows):
+    lines = []
+    for user_id, name, email, age in rows:
+        record = {'user_id': user_id, 'name': name, 'email': email, 'age': int(age)}
+        lines.append(json.dumps(record, separators=(',', ':')))
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def _encode_csv(rows):
+    text = io.StringIO()
+    csv.writer(text).writerows((user_id, name, email, int(age))
+                               for user_id, name, email, age in rows)
+    return text.getvalue().encode('utf-8')
+
+
+def _encode_parquet(rows):
+    columns = list(zip(*rows))
+    return pyarrow.table({
+        'user_id': pyarrow.array(columns[0], pyarrow.string()),
+        'name': pyarrow.array(columns[1], pyarrow.string()),
+        'email': pyarrow.array(columns[2], pyarrow.string()),
+        'age': pyarrow.array([int(age) for age in columns[3]], pyarrow.int16()),
+    })
+
+
+# --- Sinks: where the writer thread puts the payloads ---
+class _TextSink:
+    """An NDJSON/CSV file, optionally gzip or zstd compressed."""
+
+    def __init__(self, path, compression, buffer_bytes):
+        self._raw = open(path, 'wb', buffering=0)
+        if compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        elif compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor().stream_writer(
+                self._raw, write_return_read=True)
+        else:
+            self._stream = self._raw
+        self._buffer = io.BufferedWriter(self._stream, buffer_size=buffer_bytes)
+
+    def write(self, payload):
+        self._buffer.write(payload)
+
+    def close(self):
+        # Closing the buffer flushes and closes the compressor beneath it
+        self._buffer.close()
+        if not self._raw.closed:
+            self._raw.close()
+
+
+class _ParquetSink:
+    """A Parquet file; each payload becomes one row group."""
+
+    def __init__(self, path, compression):
+        self._path = path
+        self._compression = compression or 'snappy'
+        self._writer = None
+
+    def write(self, table):
+        if self._writer is None:
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self._path, table.schema, compression=self._compression)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _open_sink(path, fmt, compression, buffer_bytes):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"fmt must be one of {EXPORT_FORMATS}, got {fmt!r}")
+    if compression not in (None, 'gzip', 'zstd'):
+        raise ValueError(f"Unsupported compression {compression!r}")
+    if fmt == 'parquet':
+        if pyarrow is None:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        return _ParquetSink(path, compression)
+    if compression == 'zstd' and zstandard is None:
+        raise ImportError("zstd compression needs zstandard: pip install zstandard")
+    return _TextSink(path, compression, buffer_bytes)
+
+
+def _write_loop(sink, pending, errors, stop):
+    """Writer thread: drains the queue into the sink."""
+    try:
+        while True:
+            payload = pending.get()
+            if payload is _DONE:
+                break
+            sink.write(payload)
+    except Exception as e:
+        errors.append(e)
+        # Tells the reader not to wait on a dead writer
+        stop.set()
+
+
+def export_user_data(path, fmt='ndjson', compression=None, batch_size=EXPORT_BATCH_SIZE,
+                     buffer_bytes=WRITE_BUFFER_BYTES, queue_size=WRITE_QUEUE_SIZE):
+    """
+    Streams the whole user_data table into 'path' as 'fmt' ('ndjson',
+    'csv' or 'parquet'), optionally compressed with 'gzip' or 'zstd'.
+
+    At most 'queue_size' encoded batches of 'batch_size' rows are held
+    between the database reader and the file writer. Returns a report
+    dict with rows, bytes (encoded, before compression), file_bytes,
+    seconds, rows_per_sec and mb_per_sec.
+    """
+    encode = {'ndjson': _encode_ndjson, 'csv': _encode_csv,
+              'parquet': _encode_parquet}.get(fmt)
+    # Connect before the file is created, so a failure leaves no empty export
+    connection = connect_to_prodev()
+    if connection is None:
+        raise DriverError("Failed to connect to the database; nothing exported.")
+    try:
+        sink = _open_sink(path, fmt, compression, buffer_bytes)
+    except Exception:
+        connection.close()
+        raise
+    if fmt == 'csv':
+        sink.write((','.join(USER_COLUMNS) + '\r\n').encode('utf-8'))
+
+    pending = queue.Queue(queue_size)
+    errors = []
+    stop = threading.Event()
+    writer = threading.Thread(target=_write_loop, args=(sink, pending, errors, stop),
+                              daemon=True)
+    writer.start()
+
+    rows_written = 0
+    bytes_encoded = 0
+    started = time.perf_counter()
+    rows = seed.stream_user_data(connection, streaming=True, row_format='tuple')
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            payload = encode(batch)
+            # Blocks while the writer is 'queue_size' batches behind
+            if not put_until_stopped(pending, payload, stop):
+                break
+            rows_written += len(batch)
+            bytes_encoded += payload.nbytes if fmt == 'parquet' else len(payload)
+    finally:
+        # Finishes the cursor before the connection goes back to the pool
+        rows.close()
+        put_until_stopped(pending, _DONE, stop)
+        writer.join()
+        sink.close()
+        connection.close()
+
+    if errors:
+        raise errors[0]
+
+    seconds = time.perf_counter() - started
+    report = {
+        'rows': rows_written,
+        'bytes': bytes_encoded,
+        'file_bytes': os.path.getsize(path),
+        'seconds': seconds,
+        'rows_per_sec': rows_written / seconds if seconds else 0.0,
+        'mb_per_sec': bytes_encoded / seconds / 1e6 if seconds else 0.0,
+    }
+    print(f"Exported {rows_written} rows to {path} in {seconds:.2f}s "
+          f"({report['rows_per_sec']:.0f} rows/s, {report['mb_per_sec']:.2f} MB/s).")
+    return report
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python export.py PATH [ndjson|csv|parquet] [gzip|zstd]")
+        sys.exit(2)
+    export_user_data(sys.argv[1],
+                     sys.argv[2] if len(sys.argv) > 2 else 'ndjson',
+                     sys.argv[3] if len(sys.argv) > 3 else None)
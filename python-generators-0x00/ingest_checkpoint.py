@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""
+This module contains the checkpoints that make seed.insert_data
+resumable.
+
+After each chunk, insert_data records how far into the CSV it got (byte
+offset and row number) in the user_data_ingest table, in the same
+transaction as the chunk's rows and stats. A crash therefore never
+leaves a checkpoint behind or ahead of the committed rows, and a chunk
+that is replayed anyway is a no-op: its emails already exist, so INSERT
+IGNORE skips them. The checkpoint is deleted once the file is fully
+loaded.
+
+    python ingest_checkpoint.py show
+    python ingest_checkpoint.py clear PATH
+"""
+import os
+import sys
+from db_driver import Error, get_driver
+
+# rows_read, not row_number: that is a reserved word from MySQL 8.0.2
+CREATE_CHECKPOINT_TABLE = """
+CREATE TABLE IF NOT EXISTS user_data_ingest (
+    source VARCHAR(512) PRIMARY KEY,
+    byte_offset BIGINT NOT NULL,
+    rows_read BIGINT NOT NULL
+);
+"""
+
+
+def source_key(filename):
+    """The name a CSV file is checkpointed under: its absolute path."""
+    return os.path.realpath(filename)
+
+
+def create_checkpoint_table(connection):
+    """Creates user_data_ingest if needed."""
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(CREATE_CHECKPOINT_TABLE)
+        connection.commit()
+    except Error as e:
+        print(f"Error creating checkpoint table: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def read_checkpoint(connection, filename):
+    """
+    Returns (byte_offset, row_number) to resume 'filename' from, or None
+    to start from the beginning. A checkpoint past the end of the file
+    means the file was replaced, so it is ignored.
+    """
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT byte_offset, rows_read FROM user_data_ingest WHERE source = %s",
+            (source_key(filename),))
+        row = cursor.fetchone()
+    except Error as e:
+        print(f"Error reading checkpoint: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+    if row is None or row[0] > os.path.getsize(filename):
+        return None
+    return int(row[0]), int(row[1])
+
+
+def save_checkpoint(cursor, filename, byte_offset, row_number):
+    """
+    Records that 'filename' is loaded up to 'byte_offset' / 'row_number'.
+    Does NOT commit: the caller commits it together with the chunk.
+    """
+    driver = get_driver()
+    cursor.execute(
+        "INSERT INTO user_data_ingest (source, byte_offset, rows_read) "
+        f"VALUES (%s, %s, %s) {driver.upsert('source')} "
+        f"byte_offset = {driver.new_value('byte_offset')}, "
+        f"rows_read = {driver.new_value('rows_read')}",
+        (source_key(filename), byte_offset, row_number))
+
+
+def clear_checkpoint(cursor, filename):
+    """Forgets the checkpoint of 'filename'. Does NOT commit."""
+    cursor.execute("DELETE FROM user_data_ingest WHERE source = %s", (source_key(filename),))
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    from db_pool import connect_to_prodev
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('show', 'clear') or (command == 'clear' and len(sys.argv) < 3):
+        print("Usage: python ingest_checkpoint.py show | clear PATH")
+        sys.exit(2)
+
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    cursor = connection.cursor()
+    try:
+        if command == 'show':
+            cursor.execute("SELECT source, byte_offset, rows_read FROM user_data_ingest")
+            for source, byte_offset, row_number in cursor.fetchall():
+                print(f"{source}: row {row_number}, byte {byte_offset}")
+        else:
+            clear_checkpoint(cursor, sys.argv[2])
+            connection.commit()
+    except Error as e:
+        print(f"Error: {e}")
+    finally:
+        cursor.close()
+        connection.close()
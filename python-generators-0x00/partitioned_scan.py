@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+"""
+This module contains a parallel, partitioned scan of the user_data table.
+
+The user_id key space is split into N ranges and each range is read on
+its own pooled connection by a background thread. The partial batches
+are merged back into a single iterator, either in user_id order or in
+whatever order they arrive.
+"""
+import queue
+import threading
+import uuid
+from db_driver import DriverError, Error
+from db_pool import connect_to_prodev, get_pool
+from user_rows import USER_SELECT_LIST, discard_unread_result
+from user_ids import BINARY_IDS, to_binary, user_id_param
+from columnar import where_clause
+from prefetch import put_until_stopped
+
+# Batches each partition may read ahead of the consumer
+PARTITION_QUEUE_SIZE = 2
+
+_DONE = object()  # Sent by a partition reader when its range is exhausted
+
+
+def partition_bounds(partitions, low=0, high=1 << 128):
+    """
+    Splits the user_id key space into 'partitions' (lower, upper) ranges.
+
+    Canonical UUID strings (and their 16-byte form) sort like the 128-bit
+    numbers they spell, so evenly spaced UUIDs make evenly sized ranges
+    for random (v4) keys. Time-ordered (v7) keys are bunched together, so
+    for them pass the numeric [low, high) span actually in use (see
+    _key_span). The first lower and last upper bound are None.
+    """
+    span = high - low
+    cuts = [str(uuid.UUID(int=low + (i * span) // partitions)) for i in range(1, partitions)]
+    lowers = [None] + cuts
+    uppers = cuts + [None]
+    return list(zip(lowers, uppers))
+
+
+def _partition_query(lower, upper, ordered, columns, where):
+    """Builds the SELECT for one user_id range, plus any pushed-down predicates."""
+    conditions, params = [], []
+    if where:
+        condition, values = where_clause(where)
+        conditions.append(condition)
+        params.extend(values)
+    if lower is not None:
+        conditions.append("user_id >= %s")
+        params.append(user_id_param(lower))
+    if upper is not None:
+        conditions.append("user_id < %s")
+        params.append(user_id_param(upper))
+
+    query = f"SELECT {columns} FROM user_data"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if ordered:
+        # Qualified, so a converted user_id alias doesn't hide the key
+        query += " ORDER BY user_data.user_id"
+    return query, tuple(params)
+
+
+def _key_span():
+    """
+    Numeric [low, high) span of the stored user_ids, or the whole UUID
+    space if it can't be read (e.g. an empty table).
+    """
+    connection = connect_to_prodev()
+    if connection is None:
+        return 0, 1 << 128
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT MIN(user_id), MAX(user_id) FROM user_data")
+        low, high = cursor.fetchone()
+    except Error:
+        low = high = None
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
+    if low is None:
+        return 0, 1 << 128
+    return (int.from_bytes(to_binary(low), 'big'),
+            int.from_bytes(to_binary(high), 'big') + 1)
+
+
+def _scan_partition(lower, upper, batch_size, ordered, columns, where, dictionary,
+                    out, stop):
+    """Reads one user_id range on its own connection. Runs in a thread."""
+    connection = None
+    cursor = None
+    try:
+        connection = connect_to_prodev()
+        if connection is None:
+            raise DriverError("Failed to connect to the database.")
+
+        cursor = connection.cursor(dictionary=dictionary)
+        cursor.execute(*_partition_query(lower, upper, ordered, columns, where))
+        while not stop.is_set():
+            batch = cursor.fetchmany(batch_size)
+            if not batch or not put_until_stopped(out, batch, stop):
+                break
+        put_until_stopped(out, _DONE, stop)
+
+    except Error as e:
+        put_until_stopped(out, e, stop)
+    finally:
+        if cursor:
+            discard_unread_result(connection)
+            cursor.close()
+        if connection and connection.is_connected():
+            connection.close()
+
+
+def scan_partitioned(batch_size, partitions, ordered=True, columns=USER_SELECT_LIST,
+                     where=None, dictionary=True):
+    """
+    Generator that reads user_data in 'partitions' concurrent ranges and
+    yields lists of at most 'batch_size' rows (dicts, or tuples in
+    'columns' order with dictionary=False). 'where' is a list of
+    columnar.Predicate pushed into every partition's query.
+
+    ordered=True yields batches in user_id order: partition i is drained
+    before partition i + 1, while the later ones keep reading ahead into
+    bounded queues. ordered=False yields batches as soon as any partition
+    produces them, for maximum throughput.
+    Each partition ends with its own (possibly short) batch.
+
+    Every partition holds a pooled connection for the whole scan, so
+    'partitions' is capped at the pool size. If a partition fails (its
+    query errors, or it can't get a connection) the error is raised once
+    the batches read before it have been yielded, so a truncated scan
+    never looks like a finished one.
+    """
+    pool_size = get_pool().size
+    if partitions > pool_size:
+        print(f"Only {pool_size} pooled connections; scanning {pool_size} partitions "
+              f"instead of {partitions}.")
+        partitions = pool_size
+    if BINARY_IDS:
+        bounds = partition_bounds(partitions, *_key_span())
+    else:
+        bounds = partition_bounds(partitions)
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(PARTITION_QUEUE_SIZE) for _ in range(partitions)]
+    else:
+        queues = [queue.Queue(PARTITION_QUEUE_SIZE * partitions)] * partitions
+
+    threads = [
+        threading.Thread(target=_scan_partition,
+                         args=(lower, upper, batch_size, ordered, columns, where,
+                               dictionary, out, stop),
+                         daemon=True)
+        for (lower, upper), out in zip(bounds, queues)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        # Ordered: one queue per partition. Unordered: one shared queue
+        # that receives a _DONE from every partition.
+        sources = queues if ordered else queues[:1]
+        expected = 1 if ordered else partitions
+        for out in sources:
+            finished = 0
+            while finished < expected:
+                item = out.get()
+                if item is _DONE:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+    finally:
+        # Tell readers that are still running to stop, then wait for them
+        # so every connection is back in the pool before we return.
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,324 @@
+#!/usr/bin/python3
+"""
+This module contains a small library for composing generator stages into
+a pipeline: a source, then map / filter / batch / window / buffer
+stages, then a sink.
+
+    stats = (Pipeline(stream_users_in_batches(100), name='batches')
+             .map(score_batch, mode='process', workers=4)
+             .filter(lambda batch: len(batch) > 0)
+             .reduce(merge_scores, {}))
+
+Stages are pulled lazily, so a slow sink slows everything upstream down
+instead of letting items pile up. Where a stage runs apart from its
+consumer, a bounded queue sits between them:
+
+- mode='thread' / 'process' runs the stage's function on a thread or
+  process pool with at most 'queue_size' items in flight; results come
+  back in input order, or as they finish with ordered=False. Process
+  stages need a picklable (module-level) function.
+- buffer(depth) runs everything upstream on a background thread that
+  stays up to 'depth' items ahead (see prefetch.prefetched).
+
+Every stage counts the items in and out and the time spent on them;
+stats() returns them and report() prints them, so a slow stage shows up
+before it is scaled.
+"""
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from prefetch import prefetched
+
+STAGE_MODES = ('inline', 'thread', 'process')
+# Items a pooled stage lets in flight by default, per worker
+IN_FLIGHT_PER_WORKER = 2
+
+
+class StageStats:
+    """
+    Counters of one stage. 'busy' is the time spent producing items: in
+    the function for inline stages, from submit to result for pooled
+    ones, and waiting on upstream for the source and buffers.
+    """
+    __slots__ = ('name', 'mode', 'items_in', 'items_out', 'busy', 'started', 'finished')
+
+    def __init__(self, name, mode='inline'):
+        self.name = name
+        self.mode = mode
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self):
+        """Items out per second of wall time."""
+        return self.items_out / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def latency(self):
+        """Average busy seconds per item in."""
+        return self.busy / self.items_in if self.items_in else 0.0
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'busy': self.busy,
+            'throughput': self.throughput,
+            'latency': self.latency,
+        }
+
+
+def _timed_source(items, stats):
+    stats.started = time.perf_counter()
+    items = iter(items)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                stats.busy += time.perf_counter() - started
+            stats.items_in += 1
+            stats.items_out += 1
+            yield item
+    finally:
+        stats.finished = time.perf_counter()
+        close = getattr(items, 'close', None)
+        if close is not None:
+            close()
+
+
+def _inline(items, stats, function, outputs):
+    """Calls 'function' in the consumer's thread; outputs(item, result) says what to yield."""
+    stats.started = time.perf_counter()
+    try:
+        for item in items:
+            stats.items_in += 1
+            started = time.perf_counter()
+            result = function(item)
+            stats.busy += time.perf_counter() - started
+            for output in outputs(item, result):
+                stats.items_out += 1
+                yield output
+    finally:
+        stats.finished = time.perf_counter()
+
+
+def _pooled(items, stats, function, outputs, executor, workers, queue_size, ordered):
+    """Runs 'function' on a pool with at most 'queue_size' items in flight."""
+    stats.started = time.perf_counter()
+    pending = deque()  # (future, item, submitted at), in input order
+    pool = executor(max_workers=workers)
+
+    def finish(entry):
+        future, item, submitted = entry
+        result = future.result()
+        stats.busy += time.perf_counter() - submitted
+        for output in outputs(item, result):
+            stats.items_out += 1
+            yield output
+
+    def finish_first():
+        if ordered:
+            return finish(pending.popleft())
+        done, _ = wait([entry[0] for entry in pending], return_when=FIRST_COMPLETED)
+        entry = next(entry for entry in pending if entry[0] in done)
+        pending.remove(entry)
+        return finish(entry)
+
+    try:
+        for item in items:
+            stats.items_in += 1
+            pending.append((pool.submit(function, item), item, time.perf_counter()))
+            # The upstream isn't pulled again until a slot frees up
+            while len(pending) >= queue_size:
+                yield from finish_first()
+        while pending:
+            yield from finish_first()
+    finally:
+        for future, _, _ in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        stats.finished = time.perf_counter()
+
+
+def _batched(items, stats, size):
+    stats.started = time.perf_counter()
+    try:
+        batch = []
+        for item in items:
+            stats.items_in += 1
+            batch.append(item)
+            if len(batch) == size:
+                stats.items_out += 1
+                yield batch
+                batch = []
+        if batch:
+            stats.items_out += 1
+            yield batch
+    finally:
+        stats.finished = time.perf_counter()
+
+
+def _windowed(items, stats, size, step):
+    stats.started = time.perf_counter()
+    try:
+        window = deque(maxlen=size)
+        # Items still to take before the next window is complete
+        due = size
+        for item in items:
+            stats.items_in += 1
+            window.append(item)
+            due -= 1
+            if due == 0:
+                stats.items_out += 1
+                yield tuple(window)
+                # A step longer than the window skips items; the deque
+                # still ends up holding the right ones
+                due = step
+    finally:
+        stats.finished = time.perf_counter()
+
+
+def _buffered(items, stats, depth):
+    stats.started = time.perf_counter()
+    items = prefetched(items, depth)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                stats.busy += time.perf_counter() - started
+            stats.items_in += 1
+            stats.items_out += 1
+            yield item
+    finally:
+        items.close()
+        stats.finished = time.perf_counter()
+
+
+def _map_outputs(item, result):
+    return (result,)
+
+
+def _filter_outputs(item, result):
+    return (item,) if result else ()
+
+
+class Pipeline:
+    """
+    A source and the stages applied to it, in order. Stage methods return
+    the pipeline itself so they chain; nothing runs until it is iterated
+    (or run() / reduce() is called), and it can only be run once.
+    """
+
+    def __init__(self, source, name='source'):
+        self._source = source
+        self._stats = [StageStats(name)]
+        self._stages = []  # Callables: iterator -> iterator
+
+    def _add(self, name, mode, build):
+        stats = StageStats(name, mode)
+        self._stats.append(stats)
+        self._stages.append(lambda items: build(items, stats))
+        return self
+
+    def _apply(self, function, outputs, name, mode, workers, queue_size, ordered):
+        if mode not in STAGE_MODES:
+            raise ValueError(f"mode must be one of {STAGE_MODES}, got {mode!r}")
+        name = name or getattr(function, '__name__', 'stage')
+        if mode == 'inline':
+            return self._add(name, mode,
+                             lambda items, stats: _inline(items, stats, function, outputs))
+        executor = ThreadPoolExecutor if mode == 'thread' else ProcessPoolExecutor
+        queue_size = queue_size or workers * IN_FLIGHT_PER_WORKER
+        return self._add(name, mode, lambda items, stats: _pooled(
+            items, stats, function, outputs, executor, workers, queue_size, ordered))
+
+    def map(self, function, name=None, mode='inline', workers=1, queue_size=None,
+            ordered=True):
+        """Replaces each item by function(item)."""
+        return self._apply(function, _map_outputs, name, mode, workers, queue_size, ordered)
+
+    def filter(self, predicate, name=None, mode='inline', workers=1, queue_size=None,
+               ordered=True):
+        """Keeps the items for which predicate(item) is true."""
+        return self._apply(predicate, _filter_outputs, name, mode, workers, queue_size, ordered)
+
+    def batch(self, size, name='batch'):
+        """Groups items into lists of 'size' (the last one may be shorter)."""
+        return self._add(name, 'inline', lambda items, stats: _batched(items, stats, size))
+
+    def window(self, size, step=None, name='window'):
+        """
+        Yields tuples of 'size' consecutive items, starting a new window
+        every 'step' items: tumbling by default (step=size), sliding with
+        a smaller step. A trailing partial window is dropped.
+        """
+        step = step or size
+        return self._add(name, 'inline',
+                         lambda items, stats: _windowed(items, stats, size, step))
+
+    def buffer(self, depth=2, name='buffer'):
+        """Runs everything upstream on a background thread, up to 'depth' items ahead."""
+        return self._add(name, 'thread', lambda items, stats: _buffered(items, stats, depth))
+
+    def __iter__(self):
+        items = _timed_source(self._source, self._stats[0])
+        for stage in self._stages:
+            items = stage(items)
+        return items
+
+    def run(self, sink=None, name='sink'):
+        """Drains the pipeline into sink(item), if given. Returns the item count."""
+        stats = StageStats(name)
+        self._stats.append(stats)
+        stats.started = time.perf_counter()
+        items = iter(self)
+        try:
+            for item in items:
+                stats.items_in += 1
+                if sink is not None:
+                    started = time.perf_counter()
+                    sink(item)
+                    stats.busy += time.perf_counter() - started
+        finally:
+            items.close()
+            stats.finished = time.perf_counter()
+        return stats.items_in
+
+    def reduce(self, function, initial, name='reduce'):
+        """Folds the items into function(accumulator, item). Returns the result."""
+        result = [initial]
+
+        def fold(item):
+            result[0] = function(result[0], item)
+        self.run(fold, name)
+        return result[0]
+
+    def stats(self):
+        """Per-stage counters (StageStats.as_dict()), source first."""
+        return [stats.as_dict() for stats in self._stats]
+
+    def report(self):
+        """Prints the per-stage counters as a table."""
+        print(f"{'stage':<16} {'mode':<8} {'in':>9} {'out':>9} {'items/s':>10} {'ms/item':>9}")
+        for stats in self._stats:
+            print(f"{stats.name:<16} {stats.mode:<8} {stats.items_in:>9} {stats.items_out:>9} "
+                  f"{stats.throughput:>10.0f} {stats.latency * 1000:>9.3f}")
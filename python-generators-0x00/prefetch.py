@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""
+This module contains a background-prefetching wrapper for generators.
+
+prefetched(source, depth) runs 'source' on a background thread that
+stays up to 'depth' items ahead of the consumer, so fetching the next
+batch from the database overlaps with processing the current one.
+"""
+import queue
+import threading
+
+# Default number of items fetched ahead of the consumer
+PREFETCH_DEPTH = 2
+
+_DONE = object()  # Sent by the producer when the source is exhausted
+
+
+class _Failure:
+    """Carries an exception from the producer thread to the consumer."""
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def put_until_stopped(out, item, stop):
+    """
+    Blocks until 'item' is on the bounded queue 'out' and returns True,
+    unless the event 'stop' is set first (the other end has gone away),
+    in which case it returns False.
+    """
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(source, out, stop):
+    """Producer thread: drives 'source' and feeds the bounded queue."""
+    def put(item):
+        return put_until_stopped(out, item, stop)
+
+    try:
+        for item in source:
+            if not put(item):
+                break
+        else:
+            put(_DONE)
+    except Exception as e:
+        put(_Failure(e))
+    finally:
+        # The source (and the cursor/connection it holds) is closed on the
+        # thread that was running it
+        close = getattr(source, 'close', None)
+        if close is not None:
+            close()
+
+
+def prefetched(source, depth=PREFETCH_DEPTH):
+    """
+    Generator that yields the items of 'source' while a background
+    thread fetches up to 'depth' items ahead.
+
+    If the consumer stops early (break, close(), garbage collection) the
+    producer is told to stop and 'source' is closed before this returns.
+    An exception raised by 'source' is re-raised in the consumer.
+    """
+    out = queue.Queue(depth)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(iter(source), out, stop), daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
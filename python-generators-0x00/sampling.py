@@ -0,0 +1,317 @@
+#!/usr/bin/python3
+"""
+This module contains random samples of user_data and the estimates that
+can be made from them.
+
+A row is in a Bernoulli sample when the first 32 bits of
+MD5(seed + user_id) fall below fraction * 2^32. Neither MySQL nor SQLite
+has TABLESAMPLE, so that hash is the pushed-down equivalent: the
+condition runs inside the database (db_driver registers MD5() and CONV()
+on SQLite) and only the sampled rows cross the wire. Because it depends
+on nothing but the seed and the row's id, the same seed always selects
+the same rows, whatever the scan order, and the local fallback
+(pushdown=False) selects exactly the same ones.
+
+Fixed-size samples use reservoir sampling (Algorithm L, which skips
+ahead instead of drawing a random number per row). When the table size
+is known from user_data_stats, a Bernoulli pre-sample a little larger
+than 'size' is pushed down first and the reservoir is drawn from that,
+so only a few thousand rows are read instead of the whole table. On
+SQLite, whose MD5() is a Python function called per row, fixed-size
+samples skip the scan altogether: seeded random rowids are looked up
+directly until 'size' of them exist.
+
+    python sampling.py [SIZE]   # estimated vs exact average age
+"""
+import math
+import random
+import secrets
+import hashlib
+import statistics
+import sys
+import time
+from itertools import islice
+from db_driver import Error, get_driver
+from db_pool import connect_to_prodev
+from user_rows import USER_SELECT_LIST, STREAM_FETCH_SIZE, discard_unread_result, row_factory
+from user_ids import USER_ID_TEXT
+from user_stats import read_stats
+
+# Rows in estimate_average_age()'s sample unless told otherwise
+DEFAULT_SAMPLE_SIZE = 10000
+DEFAULT_CONFIDENCE = 0.95
+
+_HASH_RANGE = 1 << 32
+_MISSING = object()  # End of input, for reservoir_sample()
+
+
+def sample_threshold(fraction):
+    """The 32-bit hash value below which a row is in a 'fraction' sample."""
+    if not 0 <= fraction <= 1:
+        raise ValueError(f"fraction must be between 0 and 1, got {fraction!r}")
+    return int(fraction * _HASH_RANGE)
+
+
+def in_sample(user_id, seed, threshold):
+    """The local twin of the SQL sample condition, for one text user_id."""
+    digest = hashlib.md5(f"{seed}{user_id}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') < threshold
+
+
+def sample_condition(seed, fraction):
+    """SQL condition (and parameters) keeping a seeded 'fraction' of rows."""
+    # The first 8 hex digits of the MD5, as an unsigned number
+    hashed = (f"CAST(CONV(SUBSTR(MD5({get_driver().concat('%s', USER_ID_TEXT)}), 1, 8), "
+              "16, 10) AS UNSIGNED)")
+    return f"{hashed} < %s", (str(seed), sample_threshold(fraction))
+
+
+def reservoir_sample(items, size, seed=None):
+    """
+    Returns 'size' items drawn uniformly from the iterable 'items' (all
+    of them if there are fewer), in one pass and O(size) memory.
+    """
+    rng = random.Random(seed)
+    items = iter(items)
+    reservoir = list(islice(items, size))
+    if len(reservoir) < size or size == 0:
+        return reservoir
+
+    # Algorithm L: 'weight' is the largest key among the kept items, and
+    # the number of items to skip before the next replacement follows a
+    # geometric distribution, so most items cost no random draw at all.
+    # 1.0 - random() is in (0, 1], which keeps log() defined.
+    weight = math.exp(math.log(1.0 - rng.random()) / size)
+    while True:
+        skip = math.floor(math.log(1.0 - rng.random()) / math.log(1.0 - weight))
+        chosen = next(islice(items, skip, skip + 1), _MISSING)
+        if chosen is _MISSING:
+            return reservoir
+        reservoir[rng.randrange(size)] = chosen
+        weight *= math.exp(math.log(1.0 - rng.random()) / size)
+
+
+def _presample_fraction(size, population):
+    """
+    Bernoulli fraction whose sample holds at least 'size' rows with
+    overwhelming probability: about 5 standard deviations of headroom.
+    """
+    expected = size + 5 * math.sqrt(size) + 25
+    return min(1.0, expected / population) if population else 1.0
+
+
+def _table_size(connection):
+    """Rows in user_data: from user_data_stats if kept, else COUNT(*)."""
+    stats = read_stats(connection)
+    if stats is not None:
+        return stats['count']
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM user_data")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def _bernoulli_rows(connection, select_list, fraction, seed, pushdown):
+    """Generator of tuples of 'select_list' from a seeded 'fraction' sample."""
+    cursor = connection.cursor(buffered=False)
+    try:
+        if pushdown:
+            condition, params = sample_condition(seed, fraction)
+            cursor.execute(f"SELECT {select_list} FROM user_data WHERE {condition};", params)
+            while True:
+                rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+            return
+
+        # Hash each row here instead; the text id comes last and is dropped
+        threshold = sample_threshold(fraction)
+        cursor.execute(f"SELECT {select_list}, {USER_ID_TEXT} FROM user_data;")
+        while True:
+            rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if in_sample(row[-1], seed, threshold):
+                    yield row[:-1]
+    finally:
+        discard_unread_result(connection)
+        cursor.close()
+
+
+def _locator_sample(connection, select_list, size, seed, locator):
+    """
+    Fixed-size sample by probing random row locators (SQLite's rowid).
+    Every existing row is equally likely, holes left by deletes are
+    simply missed and probed again, and each probe is an index lookup.
+    """
+    rng = random.Random(seed)
+    count = _table_size(connection)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT MAX({locator}) FROM user_data")
+        highest = cursor.fetchone()[0] or 0
+        if count <= size:
+            cursor.execute(f"SELECT {select_list} FROM user_data;")
+            return cursor.fetchall()
+
+        probed, rows = set(), []
+        # The probe limit only matters if the stored row count was stale
+        while len(rows) < size and len(probed) < highest:
+            wanted = min(size - len(rows), STREAM_FETCH_SIZE, highest - len(probed))
+            batch = []
+            while len(batch) < wanted:
+                probe = rng.randint(1, highest)
+                if probe not in probed:
+                    probed.add(probe)
+                    batch.append(probe)
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"SELECT {select_list} FROM user_data "
+                           f"WHERE {locator} IN ({placeholders});", tuple(batch))
+            rows.extend(cursor.fetchall())
+        return rows
+    finally:
+        cursor.close()
+
+
+def _sample_rows(connection, select_list, fraction, size, seed, pushdown):
+    """Tuples of 'select_list' from a Bernoulli or a fixed-size sample."""
+    if (fraction is None) == (size is None):
+        raise ValueError("Give exactly one of 'fraction' or 'size'")
+    if seed is None:
+        seed = secrets.randbits(32)
+    if fraction is not None:
+        yield from _bernoulli_rows(connection, select_list, fraction, seed, pushdown)
+        return
+
+    locator = get_driver().row_locator
+    if pushdown and locator:
+        yield from _locator_sample(connection, select_list, size, seed, locator)
+        return
+
+    presample = _presample_fraction(size, _table_size(connection)) if pushdown else 1.0
+    rows = reservoir_sample(_bernoulli_rows(connection, select_list, presample, seed, pushdown),
+                            size, seed)
+    if len(rows) < size and presample < 1.0:
+        # The pre-sample came up short (or the table grew); draw from everything
+        rows = reservoir_sample(_bernoulli_rows(connection, select_list, 1.0, seed, pushdown),
+                                size, seed)
+    yield from rows
+
+
+def stream_sample(fraction=None, size=None, seed=None, row_format='dict', pushdown=True):
+    """
+    Generator that yields a random sample of user_data rows.
+
+    fraction=F keeps each row with probability F (Bernoulli) and yields
+    rows as they arrive. size=N yields exactly N rows (or the whole table
+    if smaller) chosen uniformly, once they have been drawn. Give one or
+    the other. With the same 'seed' and an unchanged table the same rows
+    come back every time; without one, every call draws a new sample.
+
+    With pushdown=True the sampling condition runs in the database;
+    otherwise every row is read and sampled here (slower; for a fraction,
+    the very same rows).
+    'row_format' is 'dict', 'tuple' or 'record' (see user_rows).
+    """
+    make_row = row_factory(row_format)
+    connection = None
+    rows = None
+    try:
+        connection = connect_to_prodev()
+        if connection is None:
+            print("Failed to connect to the database. Aborting.")
+            return
+        rows = _sample_rows(connection, USER_SELECT_LIST, fraction, size, seed, pushdown)
+        for row in rows:
+            yield row if make_row is None else make_row(row)
+    except Error as e:
+        print(f"Error sampling data: {e}")
+    finally:
+        if rows is not None:
+            rows.close()  # Finishes the cursor before the connection goes back
+        if connection and connection.is_connected():
+            connection.close()
+
+
+def mean_interval(values, confidence=DEFAULT_CONFIDENCE, population=None):
+    """
+    Sample mean of 'values' with a normal-approximation confidence
+    interval. 'population' (the number of rows sampled from) applies the
+    finite population correction, so a sample of the whole table has no
+    error at all. Returns a dict with estimate, low, high, stderr, n and
+    confidence; the bounds are None with fewer than two values.
+    """
+    values = [float(value) for value in values]
+    n = len(values)
+    result = {'estimate': statistics.fmean(values) if n else None, 'low': None, 'high': None,
+              'stderr': None, 'n': n, 'confidence': confidence}
+    if n < 2:
+        return result
+
+    stderr = statistics.stdev(values) / math.sqrt(n)
+    if population and population > 1:
+        stderr *= math.sqrt(max(population - n, 0) / (population - 1))
+    margin = statistics.NormalDist().inv_cdf((1 + confidence) / 2) * stderr
+    result.update(low=result['estimate'] - margin, high=result['estimate'] + margin,
+                  stderr=stderr)
+    return result
+
+
+def estimate_average_age(size=DEFAULT_SAMPLE_SIZE, fraction=None, seed=None,
+                         confidence=DEFAULT_CONFIDENCE, pushdown=True):
+    """
+    Estimates the average age from a sample of 'size' rows (or a
+    'fraction' of them) instead of the whole table. Only the age column
+    is read. Returns mean_interval()'s dict plus the table 'population',
+    or None if the database can't be reached.
+    """
+    if fraction is not None:
+        size = None
+    connection = None
+    try:
+        connection = connect_to_prodev()
+        if connection is None:
+            print("Failed to connect to the database. Aborting.")
+            return None
+        population = _table_size(connection)
+        ages = [row[0] for row in _sample_rows(connection, 'age', fraction, size, seed, pushdown)]
+    except Error as e:
+        print(f"Error sampling ages: {e}")
+        return None
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+    result = mean_interval(ages, confidence, population)
+    result['population'] = population
+    return result
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    from aggregates import aggregate_ages_sql
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SAMPLE_SIZE
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    try:
+        started = time.perf_counter()
+        exact = aggregate_ages_sql(connection)['avg']
+        exact_seconds = time.perf_counter() - started
+    finally:
+        connection.close()
+
+    started = time.perf_counter()
+    estimate = estimate_average_age(size, seed=42)
+    seconds = time.perf_counter() - started
+    if estimate is None or exact is None:
+        sys.exit(1)
+    print(f"Exact average age:     {exact:.3f}  ({exact_seconds * 1000:.1f}ms, full scan)")
+    print(f"Estimated from {estimate['n']} of {estimate['population']} rows: "
+          f"{estimate['estimate']:.3f}, {estimate['confidence']:.0%} CI "
+          f"[{estimate['low']:.3f}, {estimate['high']:.3f}]  ({seconds * 1000:.1f}ms)")
@@ -1,41 +1,53 @@
-import mysql.connector
-from mysql.connector import Error
+from db_driver import DB_NAME, Error, get_driver
 import os
 import csv
-import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from db_pool import connect_to_prodev
+from user_stats import create_stats_table, record_inserted
+from user_rows import USER_SELECT, STREAM_FETCH_SIZE, fetch_rows, discard_unread_result
+from user_ids import new_user_id, user_id_type
+from user_indexes import USER_DATA_INDEXES, create_indexes
+from bulk_load import bulk_load
+from email_dedupe import EmailDeduper, existing_emails
+from ingest_checkpoint import (clear_checkpoint, create_checkpoint_table, read_checkpoint,
+                               save_checkpoint)
+
+# Number of rows sent and committed per INSERT batch
+INSERT_CHUNK_SIZE = 1000
+
+# user_data's schema. user_id_type follows USER_ID_FORMAT (see user_ids.py)
+USER_DATA_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    user_id {user_id_type} PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    age DECIMAL(3, 0) NOT NULL
+);
+"""
 
-# --- Database Configuration ---
-# Read from environment variables for security
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = 'ALX_prodev'
 
 def connect_db():
-    """Connects to the MySQL database server (without specifying a database)."""
-    connection = None
-    if not DB_USER or not DB_PASS:
-        print("Error: DB_USER and DB_PASS environment variables are not set.")
-        return None
-        
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        if connection.is_connected():
-            print("Successfully connected to MySQL server.")
-    except Error as e:
-        print(f"Error connecting to MySQL server: {e}")
-    
+    """
+    Connects to the database server (without specifying a database).
+    With DB_BACKEND=sqlite this opens the SQLite file instead.
+    """
+    connection = get_driver().connect(database=False)
+    if connection is not None and connection.is_connected():
+        print(f"Successfully connected to {get_driver().name} server.")
     return connection
 
+
 def create_database(connection):
     """Creates the database ALX_prodev if it does not exist."""
     if connection is None:
         return
-        
+    if get_driver().name == 'sqlite':
+        # The SQLite file is the database; connecting created it
+        print(f"Database '{DB_NAME}' created or already exists.")
+        return
+
+    cursor = None
     try:
         cursor = connection.cursor()
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
@@ -46,40 +58,22 @@ def create_database(connection):
         if cursor:
             cursor.close()
 
-def connect_to_prodev():
-    """Connects to the ALX_prodev database in MYSQL."""
-    connection = None
-    if not DB_USER or not DB_PASS:
-        print("Error: DB_USER and DB_PASS environment variables are not set.")
-        return None
 
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME
-        )
-        if connection.is_connected():
-            print(f"Successfully connected to database '{DB_NAME}'.")
-    except Error as e:
-        print(f"Error connecting to database '{DB_NAME}': {e}")
-    
-    return connection
+def create_table(connection, indexes=USER_DATA_INDEXES, defer_indexes=False):
+    """
+    Creates a table user_data if it does not exist with the required fields,
+    along with its user_data_stats table (see user_stats.py).
+    user_id is a VARCHAR(36), or a BINARY(16) with USER_ID_FORMAT=binary16.
 
-def create_table(connection):
-    """Creates a table user_data if it does not exist with the required fields."""
+    'indexes' ({name: columns}) are the secondary indexes to build. With
+    defer_indexes=True they are left for user_indexes.create_indexes()
+    to build after a bulk load, so the load doesn't maintain them per row.
+    """
     if connection is None:
         return
 
-    create_table_query = """
-    CREATE TABLE IF NOT EXISTS user_data (
-        user_id VARCHAR(36) PRIMARY KEY,
-        name VARCHAR(255) NOT NULL,
-        email VARCHAR(255) NOT NULL UNIQUE,
-        age DECIMAL(3, 0) NOT NULL
-    );
-    """
+    create_table_query = USER_DATA_TABLE.format(table='user_data',
+                                                user_id_type=user_id_type())
     try:
         cursor = connection.cursor()
         cursor.execute(create_table_query)
@@ -90,111 +84,394 @@ def create_table(connection):
         if cursor:
             cursor.close()
 
-def load_data_from_csv(filename):
-    """Helper function to load data from the CSV file."""
-    data = []
+    if not defer_indexes:
+        create_indexes(connection, indexes)
+    create_stats_table(connection)
+
+
+def _validate_row(row):
+    """
+    Validates one CSV row and returns it as a (name, email, age) tuple,
+    or None if it is malformed.
+    """
+    # Check if the row has exactly 3 columns and a numeric age
+    if len(row) != 3:
+        return None
+    name, email, age = row
     try:
-        with open(filename, mode='r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            
-            try:
-                next(reader)  # Skip the header row
-            except StopIteration:
-                print(f"Error: {filename} is empty or has no header.")
-                return []
-                
+        return name, email, int(age)
+    except ValueError:
+        return None
+
+
+class _RejectWriter:
+    """
+    Writes malformed CSV rows to a sidecar file instead of printing them.
+    The file is only created once the first bad row shows up. A resumed
+    load appends to it, so rejects read after the last committed chunk
+    of the interrupted run are listed twice.
+    """
+
+    def __init__(self, filename, append=False):
+        self.filename = filename
+        self.count = 0
+        self._mode = 'a' if append else 'w'
+        self._file = None
+        self._writer = None
+
+    def write(self, row):
+        if self._file is None:
+            self._file = open(self.filename, mode=self._mode, encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+        self._writer.writerow(row)
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self.count:
+            print(f"Wrote {self.count} malformed rows to {self.filename}.")
+
+
+class CsvChunk(list):
+    """
+    A chunk of validated (name, email, age) rows that also knows where it
+    ends in the CSV: 'offset' is the byte offset and 'row_number' the
+    count of data rows read (rejects included) once the chunk is done.
+    Either is None when the chunk does not end on a known position.
+    """
+    __slots__ = ('offset', 'row_number')
+
+    def __init__(self, rows=(), offset=None, row_number=None):
+        super().__init__(rows)
+        self.offset = offset
+        self.row_number = row_number
+
+
+def load_data_from_csv(filename, chunk_size=INSERT_CHUNK_SIZE, reject_file=None,
+                       start_offset=0, start_row=0):
+    """
+    Generator that streams validated rows from the CSV file in chunks.
+
+    Each yielded chunk is a CsvChunk (a list) of at most 'chunk_size'
+    (name, email, age) tuples, so memory stays flat no matter how big the
+    file is. Malformed rows go to 'reject_file' (default:
+    '<filename>.rejects').
+
+    'start_offset' / 'start_row' resume from a CsvChunk's offset and
+    row_number. The last chunk always ends at the end of the file, even
+    if that makes it empty.
+    """
+    rejects = _RejectWriter(reject_file or f"{filename}.rejects", append=start_offset > 0)
+    loaded = 0
+    try:
+        with open(filename, mode='rb') as f:
+            f.seek(start_offset)
+            position = start_offset
+
+            def lines():
+                # Decoded lines for csv.reader, tracking the byte offset of
+                # the next one. The reader pulls exactly the lines of one
+                # record at a time, so 'position' is always a record boundary.
+                nonlocal position
+                for line in f:
+                    position += len(line)
+                    yield line.decode('utf-8')
+
+            reader = csv.reader(lines())
+            if start_offset == 0:
+                try:
+                    next(reader)  # Skip the header row
+                except StopIteration:
+                    print(f"Error: {filename} is empty or has no header.")
+                    return
+
+            row_number = start_row
+            chunk = CsvChunk()
             for row in reader:
-                # --- THIS IS THE FIX for Error 1 ---
-                # Check if the row is not empty AND has exactly 3 columns
-                if row and len(row) == 3:
-                    data.append(row)
-                elif row:
-                    print(f"Skipping malformed row: {row}") # Lets you see the bad data
-        
-        print(f"Loaded {len(data)} valid data rows from {filename}.")
-        
+                if not row:
+                    continue  # Blank lines are not errors
+                row_number += 1
+                valid = _validate_row(row)
+                if valid is None:
+                    rejects.write(row)
+                    continue
+                chunk.append(valid)
+                if len(chunk) == chunk_size:
+                    loaded += len(chunk)
+                    chunk.offset, chunk.row_number = position, row_number
+                    yield chunk
+                    chunk = CsvChunk()
+            loaded += len(chunk)
+            chunk.offset, chunk.row_number = position, row_number
+            yield chunk
+
+        print(f"Loaded {loaded} valid data rows from {filename}.")
+
     except FileNotFoundError:
         print(f"Error: {filename} not found. Make sure '{filename}' is in the same directory.")
-    except Exception as e:
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
         print(f"Error reading {filename}: {e}")
-    return data
+    finally:
+        rejects.close()
+
+
+# --- Parallel CSV parsing ---
+# Size of each byte range handed to a worker process
+PARALLEL_RANGE_BYTES = 16 * 1024 * 1024
+
+
+def _parse_byte_range(filename, start, end):
+    """
+    Parses the CSV lines that *start* inside [start, end) of the file.
+    Returns (rows, rejects, next_offset), where next_offset is where the
+    first line not parsed here begins. Runs inside a worker process.
+
+    Note: splitting on byte ranges assumes no quoted field contains a
+    newline, which holds for user_data.csv.
+    """
+    rows, rejects = [], []
+    with open(filename, mode='rb') as f:
+        if start == 0:
+            pos = len(f.readline())  # Skip the header row
+        else:
+            # Step back one byte so a range that begins exactly on a line
+            # boundary keeps that line; otherwise skip the partial line.
+            f.seek(start - 1)
+            pos = start - 1 + len(f.readline())
+
+        lines = []
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            lines.append(line.decode('utf-8'))
+
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        valid = _validate_row(row)
+        if valid is None:
+            rejects.append(row)
+        else:
+            rows.append(valid)
+    return rows, rejects, pos
+
+
+def load_data_from_csv_parallel(filename, workers=None, chunk_size=INSERT_CHUNK_SIZE,
+                                reject_file=None, range_bytes=PARALLEL_RANGE_BYTES,
+                                start_offset=0, start_row=0):
+    """
+    Same contract as load_data_from_csv(), but the file is split into byte
+    ranges that are parsed concurrently by a pool of processes.
+
+    Ranges are consumed in file order and only a bounded number of them
+    are in flight at once, so memory stays proportional to
+    'workers * range_bytes' rather than to the file size. Only the last
+    chunk of each range carries an offset to resume from.
+    """
+    try:
+        file_size = os.path.getsize(filename)
+    except OSError:
+        print(f"Error: {filename} not found. Make sure '{filename}' is in the same directory.")
+        return
+
+    workers = workers or os.cpu_count() or 1
+    ranges = [(start, min(start + range_bytes, file_size))
+              for start in range(start_offset, file_size, range_bytes)]
+
+    rejects = _RejectWriter(reject_file or f"{filename}.rejects", append=start_offset > 0)
+    loaded = 0
+    row_number = start_row
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for start, end in ranges:
+                pending.append(pool.submit(_parse_byte_range, filename, start, end))
+                if len(pending) < workers * 2:
+                    continue
+                for chunk in _drain_range(pending.popleft(), chunk_size, rejects, row_number):
+                    loaded += len(chunk)
+                    row_number = chunk.row_number or row_number
+                    yield chunk
+            while pending:
+                for chunk in _drain_range(pending.popleft(), chunk_size, rejects, row_number):
+                    loaded += len(chunk)
+                    row_number = chunk.row_number or row_number
+                    yield chunk
+
+            print(f"Loaded {loaded} valid data rows from {filename}.")
+        finally:
+            # Don't make the pool parse ranges nobody will read
+            for future in pending:
+                future.cancel()
+            rejects.close()
+
+
+def _drain_range(future, chunk_size, rejects, row_number):
+    """
+    Splits the result of one parsed byte range into chunks. The last
+    (possibly empty) chunk carries the offset where the range ended.
+    """
+    rows, bad_rows, next_offset = future.result()
+    for row in bad_rows:
+        rejects.write(row)
+    last = max(len(rows) - 1, 0) // chunk_size * chunk_size
+    for start in range(0, last, chunk_size):
+        yield CsvChunk(rows[start:start + chunk_size])
+    yield CsvChunk(rows[last:], next_offset, row_number + len(rows) + len(bad_rows))
+
 
-def insert_data(connection, csv_file):
+def insert_data(connection, csv_file, chunk_size=INSERT_CHUNK_SIZE, workers=1, resume=True,
+                bulk=True):
     """
-    Reads data from a CSV file and inserts it into the database.
+    Reads data from a CSV file and bulk-inserts it into the database.
     This function now matches the prototype from 0-main.py.
+
+    The CSV is streamed chunk by chunk (see load_data_from_csv), so only
+    one chunk is held in memory at a time. With 'workers' > 1 the file is
+    parsed in parallel processes. Emails repeated within the CSV are
+    dropped in-stream (see email_dedupe.EmailDeduper, bounded memory);
+    ones already in the database are resolved by the UNIQUE index on
+    'email' (INSERT IGNORE), so there is no per-row SELECT. The
+    user_data_stats running totals are updated in the same transaction
+    as each chunk.
+
+    With resume=True a checkpoint is committed with every chunk (see
+    ingest_checkpoint.py), and a load of the same file that was cut
+    short picks up after the last committed chunk.
+
+    With bulk=True a load into an empty SQLite table goes in as a single
+    transaction instead (see bulk_load.py); elsewhere the chunked path is
+    used.
+    Returns a (inserted, skipped) tuple.
     """
     if connection is None:
-        return
+        return 0, 0
 
-    # --- Step 1: Load data from the CSV file ---
-    # This now uses the more robust 'load_data_from_csv' function
-    data = load_data_from_csv(csv_file)
-    if not data:
-        print("No valid data loaded from CSV, nothing to insert.")
-        return
+    if bulk:
+        try:
+            result = bulk_load(connection, csv_file, chunk_size, workers)
+        except Error as e:
+            print(f"Error inserting data: {e}")
+            return 0, 0
+        if result is not None:
+            return result
+
+    resume = resume and os.path.exists(csv_file)
+    start_offset, start_row = 0, 0
+    if resume:
+        create_checkpoint_table(connection)
+        checkpoint = read_checkpoint(connection, csv_file)
+        if checkpoint is not None:
+            start_offset, start_row = checkpoint
+            print(f"Resuming {csv_file} after row {start_row} (byte {start_offset}).")
+
+    # --- Step 1: Stream data from the CSV file ---
+    if workers > 1:
+        chunks = load_data_from_csv_parallel(csv_file, workers, chunk_size,
+                                             start_offset=start_offset, start_row=start_row)
+    else:
+        chunks = load_data_from_csv(csv_file, chunk_size,
+                                    start_offset=start_offset, start_row=start_row)
 
-    # --- Step 2: Insert data into the database ---
+    # --- Step 2: Insert data into the database, one chunk at a time ---
     cursor = None
+    rows_inserted = 0
+    rows_skipped = 0
     try:
         cursor = connection.cursor()
-        
-        check_query = "SELECT user_id FROM user_data WHERE email = %s"
-        insert_query = "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
-        
-        rows_to_insert = []
-        rows_skipped = 0
-        
-        for row in data:
-            name, email, age = row
-            # Check if email already exists
-            cursor.execute(check_query, (email,))
-            if cursor.fetchone() is None:
-                # If email not found, add to our list for insertion
-                user_id = str(uuid.uuid4())
-                rows_to_insert.append((user_id, name, email, int(age)))
-            else:
-                rows_skipped += 1
-        
-        # Insert all new rows in a single, efficient operation
-        if rows_to_insert:
-            cursor.executemany(insert_query, rows_to_insert)
+
+        # IGNORE makes the server drop rows whose email already exists;
+        # cursor.rowcount then tells us how many rows were really added.
+        insert_query = (
+            f"{get_driver().insert_ignore} INTO user_data (user_id, name, email, age) "
+            "VALUES (%s, %s, %s, %s)"
+        )
+
+        # Suspected repeats are confirmed against rows already written
+        deduper = EmailDeduper(confirm=lambda emails: existing_emails(cursor, emails))
+        end_of_file = os.path.getsize(csv_file) if resume else None
+        for chunk in chunks:
+            rows = [(new_user_id(), name, email, age)
+                    for name, email, age in deduper.filter(chunk)]
+            inserted = 0
+            if rows:
+                cursor.executemany(insert_query, rows)
+                inserted = max(cursor.rowcount, 0)
+
+            # Stats, checkpoint and rows are committed together, one chunk
+            # at a time
+            record_inserted(cursor, rows, inserted)
+            if resume and chunk.offset is not None:
+                if chunk.offset >= end_of_file:
+                    clear_checkpoint(cursor, csv_file)  # Fully loaded
+                else:
+                    save_checkpoint(cursor, csv_file, chunk.offset, chunk.row_number)
             connection.commit()
-            print(f"Successfully inserted {len(rows_to_insert)} new rows.")
-        
+
+            rows_inserted += inserted
+            rows_skipped += len(rows) - inserted
+
+        deduper.report()
+        rows_skipped += deduper.duplicates
+        if not rows_inserted and not rows_skipped:
+            print("No valid data loaded from CSV, nothing to insert.")
+            return 0, 0
+
+        print(f"Successfully inserted {rows_inserted} new rows.")
+
         if rows_skipped > 0:
             print(f"Skipped {rows_skipped} rows (email already exists).")
-            
-        if not rows_to_insert and rows_skipped > 0:
+
+        if not rows_inserted and rows_skipped > 0:
             print("All valid data rows were already present in the database.")
-            
+
     except Error as e:
         print(f"Error inserting data: {e}")
-    except ValueError as e:
-        print(f"Data error: {e}. Check if 'age' is a valid number.")
     finally:
+        chunks.close()
         if cursor:
             cursor.close()
 
+    return rows_inserted, rows_skipped
+
+
 # --- THIS IS THE FIX for Error 2 ---
-def stream_user_data(connection):
-    """Generator that streams user_data rows one by one."""
+def stream_user_data(connection, streaming=False, fetch_size=STREAM_FETCH_SIZE,
+                     row_format='dict'):
+    """
+    Generator that streams user_data rows one by one.
+
+    By default rows are dicts from a dictionary=True cursor, as 0-main.py
+    expects. With streaming=True an explicitly unbuffered cursor pulls
+    'fetch_size' rows per round trip, so client memory stays constant even
+    on a full scan. 'row_format' may be 'dict', 'tuple' or 'record'
+    (see user_rows.UserRecord); the last two skip the per-row dict.
+    """
     if connection is None:
         print("No database connection.")
         return
 
     cursor = None
     try:
-        # dictionary=True makes the cursor return rows as dictionaries
-        # which is what your 0-main.py file expects (e.g., row['name'])
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data;")
-        
-        for row in cursor:
-            yield row
-            
+        if streaming or row_format != 'dict':
+            cursor = connection.cursor(buffered=False) if streaming else connection.cursor()
+            cursor.execute(f"{USER_SELECT};")
+            yield from fetch_rows(cursor, fetch_size, row_format)
+        else:
+            # dictionary=True makes the cursor return rows as dictionaries
+            # which is what your 0-main.py file expects (e.g., row['name'])
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(f"{USER_SELECT};")
+
+            for row in cursor:
+                yield row
+
     except Error as e:
         print(f"Error streaming data: {e}")
     finally:
         if cursor:
-            cursor.close()
\ No newline at end of file
+            discard_unread_result(connection)
+            cursor.close()
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+"""
+This module contains mergeable streaming sketches for user_data columns.
+
+- KLLSketch: approximate quantiles (p50/p95/p99...) of a numeric stream
+  in O(k log n) memory.
+- HyperLogLog: approximate distinct counts (emails, domains...) in
+  2**precision bytes.
+- BloomFilter: approximate set membership ("seen this email before?")
+  with no false negatives, in about 1.2 bytes per item at 1% error.
+
+All three are fed one value at a time from the existing generators and
+can be merged, so partial sketches built by parallel workers (threads or
+processes, they pickle cleanly) combine into one result.
+"""
+import hashlib
+import math
+import random
+
+# KLL: larger k = more accurate; rank error is roughly 1.7 / k
+DEFAULT_K = 200
+# HLL: 2**14 registers, ~0.8% standard error on distinct counts
+DEFAULT_PRECISION = 14
+
+
+class _Compactor(list):
+    """One level of a KLL sketch. Each item stands for 2**level inputs."""
+
+    def compact(self, rng):
+        """Sorts, then promotes every other item (random offset) to the next level."""
+        self.sort()
+        offset = rng.random() < 0.5
+        promoted = []
+        while len(self) >= 2:
+            high, low = self.pop(), self.pop()
+            promoted.append(high if offset else low)
+        return promoted
+
+
+class KLLSketch:
+    """
+    A KLL quantile sketch. 'k' trades memory for accuracy; 'seed' makes
+    the random compactions reproducible.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.count = 0
+        self._rng = random.Random(seed)
+        self._compactors = []
+        self._size = 0
+        self._max_size = 0
+        self._grow()
+
+    def _grow(self):
+        self._compactors.append(_Compactor())
+        self._max_size = sum(self._capacity(h) for h in range(len(self._compactors)))
+
+    def _capacity(self, height):
+        # Lower levels get less room: capacity shrinks by 2/3 per level
+        depth = len(self._compactors) - height - 1
+        return int(math.ceil((2 / 3) ** depth * self.k)) + 1
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for height, compactor in enumerate(self._compactors):
+                if len(compactor) >= self._capacity(height):
+                    if height + 1 >= len(self._compactors):
+                        self._grow()
+                    self._compactors[height + 1].extend(compactor.compact(self._rng))
+                    break
+            self._size = sum(len(c) for c in self._compactors)
+
+    def add(self, value):
+        self._compactors[0].append(value)
+        self._size += 1
+        self.count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Folds 'other' into this sketch and returns self."""
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for height, compactor in enumerate(other._compactors):
+            self._compactors[height].extend(compactor)
+        self.count += other.count
+        self._size = sum(len(c) for c in self._compactors)
+        self._compress()
+        return self
+
+    def quantiles(self, fractions):
+        """Returns the approximate value at each fraction (0..1) of the data."""
+        if not self.count:
+            return [None for _ in fractions]
+        weighted = sorted((value, 1 << height)
+                          for height, compactor in enumerate(self._compactors)
+                          for value in compactor)
+        total = sum(weight for _, weight in weighted)
+
+        results = []
+        for fraction in fractions:
+            target = fraction * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, fraction):
+        return self.quantiles([fraction])[0]
+
+
+def _hash64(value):
+    """
+    A stable 64-bit hash. Python's hash() is salted per process, which
+    would make sketches from different workers impossible to merge.
+    """
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HyperLogLog:
+    """A HyperLogLog distinct counter with 2**precision one-byte registers."""
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @classmethod
+    def for_error(cls, relative_error):
+        """Builds a counter whose standard error is about 'relative_error'."""
+        precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+        return cls(min(max(precision, 4), 18))
+
+    def add(self, value):
+        hashed = _hash64(value)
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rest = hashed & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Folds 'other' into this counter and returns self."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class BloomFilter:
+    """
+    A Bloom filter sized for 'capacity' items at a false positive rate of
+    'error_rate'. 'value in bloom' is never wrong when it says False; a
+    True may be a false positive. Past 'capacity' items the false
+    positive rate climbs, but a True is still never missed.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be >= 1 and error_rate in (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        size = self.size
+        return [(first + i * second) % size for i in range(self.hashes)]
+
+    def add(self, value):
+        """Adds 'value'. Returns True if it may have been present already."""
+        present = True
+        bits = self.bits
+        for position in self._positions(value):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(value))
+
+    def merge(self, other):
+        """Folds 'other' (same size and hash count) into this filter and returns self."""
+        if (other.size, other.hashes) != (self.size, self.hashes):
+            raise ValueError("Cannot merge Bloom filters of different shapes")
+        self.bits = bytearray(a | b for a, b in zip(self.bits, other.bits))
+        self.count += other.count
+        return self
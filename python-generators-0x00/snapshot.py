@@ -0,0 +1,484 @@
+#!/usr/bin/python3
+"""
+This module contains a local, column-oriented snapshot of user_data for
+repeated analytical scans.
+
+The snapshot is one file, read through mmap:
+
+    magic, directory length, JSON directory (row count, change marker,
+    byte order, where each section starts), then the 8-byte aligned
+    sections:
+      age                       int16 per row (fixed width)
+      user_id / name / email    int64 end offsets, then the UTF-8 bytes
+
+Nothing is parsed when the file is opened. Ages are read in place (an
+ndarray over the mapping with NumPy, a memoryview without it) and a
+string is only decoded when its row is actually read, so a filter on age
+decodes just the matching rows. Repeated scans are served by the OS page
+cache instead of the database.
+
+open_snapshot() refreshes the file only when user_data has changed: the
+change marker (row count, sum of ages, total name and email length, the
+highest user_id and, with change tracking on, the latest updated_at,
+computed by the database) is compared with the one stored in the file.
+The check itself runs at most once every USER_SNAPSHOT_MAX_AGE seconds.
+Without change tracking, an edit that keeps all of those the same is not
+noticed; 'build' rewrites the file regardless.
+
+    python snapshot.py build | info | bench
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from db_driver import Error
+from db_pool import connect_to_prodev
+from aggregates import AGGREGATE_QUERY, AgeStats, accumulate_ages
+from columnar import NUMERIC_COLUMNS, ColumnBatch, Predicate
+from change_stream import CHANGE_COLUMN, change_tracking_enabled
+from user_rows import (USER_COLUMNS, USER_SELECT, STREAM_FETCH_SIZE, discard_unread_result,
+                       row_factory)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; ages are then read through a memoryview
+    np = None
+
+SNAPSHOT_PATH = os.getenv('USER_SNAPSHOT_PATH', 'user_data.snapshot')
+# Seconds a snapshot is trusted before user_data is checked for changes again
+SNAPSHOT_MAX_AGE = float(os.getenv('USER_SNAPSHOT_MAX_AGE', '60'))
+
+SNAPSHOT_MAGIC = b'UDSNAP01'
+_PREFIX = struct.Struct('<8sI')  # magic, directory length
+_OFFSET_TYPE = 'q'               # String end offsets (int64)
+_ALIGN = 8
+
+STRING_COLUMNS = tuple(name for name in USER_COLUMNS if name not in NUMERIC_COLUMNS)
+
+MARKER_QUERY = (
+    "SELECT COUNT(*), COALESCE(SUM(age), 0), "
+    "COALESCE(SUM(LENGTH(name) + LENGTH(email)), 0), MAX(user_id){extra} FROM user_data"
+)
+
+
+def table_marker(connection):
+    """
+    A short digest that changes whenever rows are added, removed or
+    resized. With change tracking on (see change_stream.py) it also
+    includes the latest updated_at, so any edit changes it; without it,
+    an edit that keeps every value the same length goes unnoticed.
+    """
+    extra = f", MAX({CHANGE_COLUMN})" if change_tracking_enabled(connection) else ""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(MARKER_QUERY.format(extra=extra))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    text = '|'.join(value.hex() if isinstance(value, (bytes, bytearray)) else str(value)
+                    for value in row)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# --- Writing ---
+def _padding(position):
+    return -position % _ALIGN
+
+
+def write_snapshot(connection, path=SNAPSHOT_PATH, fetch_size=STREAM_FETCH_SIZE, marker=None):
+    """
+    Streams user_data (in user_id order) into a new snapshot at 'path'.
+    Columns are spooled to temporary files while the rows arrive, so
+    memory stays constant, then assembled and moved into place
+    atomically; readers holding the previous file keep their mapping.
+    Returns the number of rows written.
+    """
+    if marker is None:
+        # Taken before the scan: a change made during it makes the stored
+        # marker stale, so the next check rebuilds rather than trusting it
+        marker = table_marker(connection)
+    directory = os.path.dirname(os.path.abspath(path))
+    data = {name: tempfile.TemporaryFile(dir=directory) for name in USER_COLUMNS}
+    offsets = {name: tempfile.TemporaryFile(dir=directory) for name in STRING_COLUMNS}
+    ends = dict.fromkeys(STRING_COLUMNS, 0)
+    rows = 0
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(f"{USER_SELECT} ORDER BY user_data.user_id;")
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            rows += len(batch)
+            for name, values in zip(USER_COLUMNS, zip(*batch)):
+                if name in NUMERIC_COLUMNS:
+                    typecode = NUMERIC_COLUMNS[name][0]
+                    data[name].write(array(typecode, map(int, values)).tobytes())
+                    continue
+                encoded = [value.encode('utf-8') for value in values]
+                positions = array(_OFFSET_TYPE)
+                end = ends[name]
+                for value in encoded:
+                    end += len(value)
+                    positions.append(end)
+                ends[name] = end
+                data[name].write(b''.join(encoded))
+                offsets[name].write(positions.tobytes())
+    finally:
+        discard_unread_result(connection)
+        cursor.close()
+
+    # Lay the sections out after the directory; its length depends on the
+    # numbers in it, so grow the reserved space until it fits
+    sections = []
+    for name in USER_COLUMNS:
+        if name in STRING_COLUMNS:
+            # A leading 0 so that row i spans offsets[i]:offsets[i + 1]
+            sections.append((name, 'offsets', offsets[name], array(_OFFSET_TYPE, [0]).tobytes()))
+        sections.append((name, 'data', data[name], b''))
+    reserved = 512
+    while True:
+        position = _PREFIX.size + reserved
+        columns = {}
+        for name, kind, spool, head in sections:
+            position += _padding(position)
+            size = len(head) + spool.tell()
+            entry = columns.setdefault(name, {'type': NUMERIC_COLUMNS.get(name, ('str',))[0]})
+            entry[kind] = [position, size]
+            position += size
+        header = json.dumps({'rows': rows, 'marker': marker, 'byteorder': sys.byteorder,
+                             'created': time.time(), 'columns': columns}).encode('utf-8')
+        if len(header) <= reserved:
+            break
+        reserved *= 2
+
+    temporary = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(temporary, 'wb') as out:
+            out.write(_PREFIX.pack(SNAPSHOT_MAGIC, reserved))
+            out.write(header.ljust(reserved, b' '))
+            for name, kind, spool, head in sections:
+                out.write(b'\0' * _padding(out.tell()))
+                out.write(head)
+                spool.seek(0)
+                shutil.copyfileobj(spool, out)
+        os.replace(temporary, path)
+    finally:
+        for spool in (*data.values(), *offsets.values()):
+            spool.close()
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+    return rows
+
+
+# --- Reading ---
+class StringColumn:
+    """
+    An offset-indexed UTF-8 column inside the mapping. column[i] decodes
+    one value; nothing is decoded until it is read.
+    """
+    __slots__ = ('offsets', 'data')
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+    def take(self, indexes):
+        """Decodes the values at 'indexes' into a list."""
+        offsets, data = self.offsets, self.data
+        return [str(data[offsets[i]:offsets[i + 1]], 'utf-8') for i in indexes]
+
+    def __iter__(self):
+        return iter(self.take(range(len(self))))
+
+
+class UserSnapshot:
+    """
+    A read-only, memory-mapped user_data snapshot written by
+    write_snapshot(). Rows are in user_id order.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        with open(path, 'rb') as source:
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, length = _PREFIX.unpack_from(view)
+        if magic != SNAPSHOT_MAGIC:
+            view.release()
+            self._map.close()
+            raise ValueError(f"{path} is not a user_data snapshot")
+        self.header = json.loads(bytes(view[_PREFIX.size:_PREFIX.size + length]))
+        if self.header['byteorder'] != sys.byteorder:
+            view.release()
+            self._map.close()
+            raise ValueError(f"{path} was written on a {self.header['byteorder']}-endian host")
+
+        self.length = self.header['rows']
+        self.marker = self.header['marker']
+        self.columns = {}
+        for name, entry in self.header['columns'].items():
+            start, size = entry['data']
+            if name in STRING_COLUMNS:
+                offset_start, offset_size = entry['offsets']
+                offsets = view[offset_start:offset_start + offset_size].cast(_OFFSET_TYPE)
+                self.columns[name] = StringColumn(offsets, view[start:start + size])
+            elif np is not None:
+                self.columns[name] = np.frombuffer(self._map, dtype=NUMERIC_COLUMNS[name][1],
+                                                   count=self.length, offset=start)
+            else:
+                self.columns[name] = view[start:start + size].cast(entry['type'])
+        self._view = view
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __repr__(self):
+        return f"UserSnapshot({self.path!r}, {len(self)} rows)"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Unmaps the file, unless arrays read from it are still alive."""
+        self.columns = {}
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass  # An ndarray still points into the mapping; GC unmaps it
+
+    def _matching(self, start, stop, predicates):
+        """Indexes in [start, stop) that pass every predicate, or None for all."""
+        if not predicates:
+            return None
+        mask = None
+        for predicate in predicates:
+            column = self.columns[predicate.column][start:stop]
+            if isinstance(column, memoryview):
+                column = column.tolist()
+            current = predicate.mask(ColumnBatch({predicate.column: column}, stop - start))
+            if mask is None:
+                mask = current
+            elif np is not None and isinstance(mask, np.ndarray):
+                mask = mask & current
+            else:
+                mask = [a and b for a, b in zip(mask, current)]
+        if np is not None and isinstance(mask, np.ndarray):
+            return np.flatnonzero(mask) + start
+        return [start + i for i, keep in enumerate(mask) if keep]
+
+    def batches(self, batch_size=STREAM_FETCH_SIZE, where=None, columnar=False,
+                row_format='dict'):
+        """
+        Generator of batches shaped like stream_users_in_batches():
+        lists of rows in 'row_format', or ColumnBatch with columnar=True.
+        'where' (columnar.Predicate list) is evaluated on the mapped
+        columns first, so only matching rows are decoded.
+        """
+        make_row = row_factory(row_format)
+        ages = self.columns['age']
+        for start in range(0, self.length, batch_size):
+            stop = min(start + batch_size, self.length)
+            selected = self._matching(start, stop, where)
+            indexes = range(start, stop) if selected is None else selected
+            if not len(indexes):
+                continue
+
+            if np is not None:
+                age = ages[start:stop] if selected is None else ages[selected]
+            else:
+                age = ages[start:stop].tolist() if selected is None else [ages[i] for i in indexes]
+            if columnar:
+                values = {name: self.columns[name].take(indexes) for name in STRING_COLUMNS}
+                values['age'] = age if np is not None else array(NUMERIC_COLUMNS['age'][0], age)
+                yield ColumnBatch.from_columns(values, len(indexes))
+                continue
+
+            if np is not None:
+                age = age.tolist()
+            rows = list(zip(self.columns['user_id'].take(indexes),
+                            self.columns['name'].take(indexes),
+                            self.columns['email'].take(indexes), age))
+            yield rows if make_row is None else list(map(make_row, rows))
+
+    def column(self, name):
+        """Generator of one column's values (ages as ints), like stream_user_column()."""
+        column = self.columns[name]
+        for start in range(0, self.length, STREAM_FETCH_SIZE):
+            stop = min(start + STREAM_FETCH_SIZE, self.length)
+            if name in STRING_COLUMNS:
+                yield from column.take(range(start, stop))
+            else:
+                yield from column[start:stop].tolist()
+
+    def aggregate(self, bucket_size=None):
+        """Same result as aggregates.accumulate_ages() over the mapped ages."""
+        ages = self.columns['age']
+        if np is None:
+            return accumulate_ages(ages, bucket_size)
+        if bucket_size is None:
+            return _stats(ages).as_dict()
+        buckets = ages // bucket_size * bucket_size
+        return {int(bucket): _stats(ages[buckets == bucket]).as_dict()
+                for bucket in np.unique(buckets)}
+
+
+def _stats(ages):
+    """AgeStats of an ndarray of ages."""
+    if not len(ages):
+        return AgeStats()
+    return AgeStats(len(ages), int(ages.sum(dtype=np.int64)), int(ages.min()), int(ages.max()))
+
+
+def _open_existing(path):
+    try:
+        return UserSnapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(path):
+            print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def open_snapshot(path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE):
+    """
+    Returns a UserSnapshot of the current user_data, writing or refreshing
+    the file first if the table changed. A snapshot checked less than
+    'max_age' seconds ago is used without asking the database. If the
+    database can't be reached, an existing (possibly stale) snapshot is
+    still returned; None if there is none.
+    """
+    snapshot = _open_existing(path)
+    if snapshot is not None and time.time() - os.path.getmtime(path) < max_age:
+        return snapshot
+
+    connection = connect_to_prodev()
+    if connection is None:
+        if snapshot is not None:
+            print("Database unavailable; using the existing snapshot as is.")
+        return snapshot
+    try:
+        marker = table_marker(connection)
+        if snapshot is not None and snapshot.marker == marker:
+            try:
+                os.utime(path)  # Trusted for another max_age seconds
+            except OSError:
+                pass
+            return snapshot
+
+        if snapshot is not None:
+            snapshot.close()
+        started = time.perf_counter()
+        rows = write_snapshot(connection, path, marker=marker)
+        print(f"Snapshot of {rows} rows written to {path} "
+              f"in {time.perf_counter() - started:.2f}s.")
+        return UserSnapshot(path)
+    except Error as e:
+        print(f"Error refreshing snapshot: {e}")
+        return snapshot
+    finally:
+        connection.close()
+
+
+# --- Main Execution ---
+def _best_of(run, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def benchmark(connection, path=SNAPSHOT_PATH):
+    """Times an 'age > 25' row scan and the age aggregate: database vs snapshot."""
+    over_25 = Predicate('age', '>', 25)
+
+    def scan_database():
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"{USER_SELECT} WHERE age > %s", (25,))
+            while cursor.fetchmany(STREAM_FETCH_SIZE):
+                pass
+        finally:
+            cursor.close()
+
+    def aggregate_database():
+        cursor = connection.cursor()
+        try:
+            cursor.execute(AGGREGATE_QUERY)
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+    snapshot = open_snapshot(path)
+    if snapshot is None:
+        return
+    runs = {
+        'rows age > 25': (scan_database,
+                          lambda: [None for _ in snapshot.batches(where=[over_25],
+                                                                  row_format='tuple')]),
+        'aggregate ages': (aggregate_database, snapshot.aggregate),
+    }
+    print(f"{'query':<16} {'database':>10} {'snapshot':>10}")
+    for label, (database, local) in runs.items():
+        before, after = _best_of(database), _best_of(local)
+        print(f"{label:<16} {before * 1000:8.1f}ms {after * 1000:8.1f}ms  x{before / after:.1f}")
+    snapshot.close()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('build', 'info', 'bench'):
+        print("Usage: python snapshot.py build | info | bench")
+        sys.exit(2)
+
+    if command == 'info':
+        snapshot = _open_existing(SNAPSHOT_PATH)
+        if snapshot is None:
+            print(f"No snapshot at {SNAPSHOT_PATH}.")
+            sys.exit(1)
+        checked = time.time() - os.path.getmtime(SNAPSHOT_PATH)
+        print(f"{SNAPSHOT_PATH}: {len(snapshot)} rows, {os.path.getsize(SNAPSHOT_PATH)} bytes, "
+              f"last checked {checked:.0f}s ago")
+        snapshot.close()
+        sys.exit(0)
+
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    try:
+        if command == 'build':
+            started = time.perf_counter()
+            rows = write_snapshot(connection)
+            print(f"Snapshot of {rows} rows written to {SNAPSHOT_PATH} "
+                  f"in {time.perf_counter() - started:.2f}s.")
+        else:
+            benchmark(connection)
+    except Error as e:
+        print(f"Error: {e}")
+    finally:
+        connection.close()
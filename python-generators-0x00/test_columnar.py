@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Unit tests for columnar.py.
+"""
+import pickle
+import unittest
+from columnar import ColumnBatch, Predicate
+
+ROWS = [
+    ('00000000-0000-4000-8000-000000000001', 'Ann', 'ann@example.com', 31),
+    ('00000000-0000-4000-8000-000000000002', 'Bob', 'bob@example.com', 67),
+    ('00000000-0000-4000-8000-000000000003', 'Cyé', 'cy@example.com', 18),
+]
+
+
+def _plain(batch):
+    """The rows of 'batch' as dicts of plain Python values."""
+    return [{name: value if isinstance(value, str) else int(value)
+             for name, value in row.items()} for row in batch.rows()]
+
+
+class TestColumnBatchPickle(unittest.TestCase):
+    """
+    Test class for pickling a ColumnBatch.
+    """
+
+    def test_round_trip(self) -> None:
+        """
+        Test that NumPy and array batches survive pickling.
+        """
+        for use_numpy in (True, False):
+            with self.subTest(use_numpy=use_numpy):
+                batch = ColumnBatch.from_rows(ROWS, use_numpy=use_numpy)
+                copy = pickle.loads(pickle.dumps(batch))
+                self.assertEqual(len(copy), 3)
+                self.assertEqual(_plain(copy), _plain(batch))
+
+    def test_value_with_separator(self) -> None:
+        """
+        Test that a string holding the column separator round-trips.
+        """
+        rows = [ROWS[0], ROWS[1][:1] + ('B\x00b',) + ROWS[1][2:]]
+        copy = pickle.loads(pickle.dumps(ColumnBatch.from_rows(rows)))
+        self.assertEqual(list(copy['name']), ['Ann', 'B\x00b'])
+
+    def test_empty_batch(self) -> None:
+        """
+        Test that an empty batch round-trips.
+        """
+        copy = pickle.loads(pickle.dumps(ColumnBatch.from_rows([])))
+        self.assertEqual(len(copy), 0)
+        self.assertEqual(list(copy['email']), [])
+
+    def test_filtered_copy_is_writable(self) -> None:
+        """
+        Test that an unpickled batch can still be filtered.
+        """
+        copy = pickle.loads(pickle.dumps(ColumnBatch.from_rows(ROWS)))
+        adults = copy.filter([Predicate('age', '>=', 21)])
+        self.assertEqual(list(adults['name']), ['Ann', 'Bob'])
+
+
+if __name__ == '__main__':
+    unittest.main()
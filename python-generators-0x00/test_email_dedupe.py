@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit tests for email_dedupe.py.
+"""
+import unittest
+from email_dedupe import EmailDeduper
+
+
+def _rows(*emails):
+    """(name, email, age) rows for 'emails'."""
+    return [('Name', email, 30) for email in emails]
+
+
+def _emails(rows):
+    return [row[1] for row in rows]
+
+
+class TestEmailDeduper(unittest.TestCase):
+    """
+    Test class for the exact-set to Bloom filter switchover.
+    """
+
+    def test_exact_phase(self) -> None:
+        """
+        Test that repeats are dropped exactly before the limit.
+        """
+        deduper = EmailDeduper(exact_limit=10, capacity=100)
+        self.assertEqual(_emails(deduper.filter(_rows('a', 'b', 'a'))), ['a', 'b'])
+        self.assertEqual(_emails(deduper.filter(_rows('b', 'c'))), ['c'])
+        self.assertIsNone(deduper.bloom)
+        self.assertEqual(deduper.seen, {'a', 'b', 'c'})
+        self.assertEqual(deduper.duplicates, 2)
+
+    def test_switchover(self) -> None:
+        """
+        Test that passing the limit moves the emails into a Bloom filter.
+        """
+        deduper = EmailDeduper(exact_limit=3, capacity=100)
+        deduper.filter(_rows('a', 'b', 'c'))
+        self.assertIsNone(deduper.bloom)
+        deduper.filter(_rows('d'))
+        self.assertIsNone(deduper.seen)
+        self.assertTrue(all(email in deduper.bloom for email in 'abcd'))
+
+    def test_repeats_caught_after_switchover(self) -> None:
+        """
+        Test that emails seen before the switch are confirmed as repeats.
+        """
+        asked = []
+
+        def confirm(emails):
+            emails = list(emails)
+            asked.extend(emails)
+            return set(emails) & {'a', 'b', 'c', 'd'}
+        deduper = EmailDeduper(confirm=confirm, exact_limit=3, capacity=100)
+        deduper.filter(_rows('a', 'b', 'c', 'd'))
+        kept = deduper.filter(_rows('a', 'e', 'e', 'd', 'f'))
+        self.assertEqual(_emails(kept), ['e', 'f'])
+        self.assertEqual(sorted(asked), ['a', 'd'])
+        self.assertEqual((deduper.duplicates, deduper.confirmations), (3, 2))
+
+    def test_false_positive_let_through(self) -> None:
+        """
+        Test that a Bloom hit the database clears is kept.
+        """
+        deduper = EmailDeduper(confirm=lambda emails: set(), exact_limit=1, capacity=100)
+        deduper.filter(_rows('a', 'b'))
+        self.assertEqual(_emails(deduper.filter(_rows('a'))), ['a'])
+        self.assertEqual((deduper.duplicates, deduper.false_positives), (0, 1))
+
+    def test_no_confirm(self) -> None:
+        """
+        Test that without 'confirm' suspects are left to the database.
+        """
+        deduper = EmailDeduper(exact_limit=1, capacity=100)
+        deduper.filter(_rows('a', 'b'))
+        self.assertEqual(_emails(deduper.filter(_rows('a', 'c'))), ['c', 'a'])
+        self.assertEqual(deduper.confirmations, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Unit tests for partitioned_scan.py, run against a temporary SQLite file.
+"""
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+import db_driver
+import db_pool
+from columnar import Predicate
+from partitioned_scan import partition_bounds, scan_partitioned
+from seed import create_table
+
+batch_processing = __import__('1-batch_processing')
+
+ROW_COUNT = 1000
+
+
+class TestPartitionBounds(unittest.TestCase):
+    """
+    Test class for the partition_bounds function.
+    """
+
+    def test_ranges_cover_key_space(self) -> None:
+        """
+        Test that the ranges are contiguous and open at both ends.
+        """
+        bounds = partition_bounds(4)
+        self.assertEqual(len(bounds), 4)
+        self.assertIsNone(bounds[0][0])
+        self.assertIsNone(bounds[-1][1])
+        for (_, upper), (lower, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(upper, lower)
+        self.assertEqual(bounds[1][0], str(uuid.UUID(int=1 << 126)))
+
+    def test_single_partition(self) -> None:
+        """
+        Test that one partition is the whole table.
+        """
+        self.assertEqual(partition_bounds(1), [(None, None)])
+
+
+class TestScanPartitioned(unittest.TestCase):
+    """
+    Test class comparing the partitioned scan with the serial scan.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'ALX_prodev.db')
+        pool = db_pool.ConnectionPool(size=4, timeout=5)
+        cls.addClassCleanup(pool.close_all)
+        for target, name, value in ((db_driver, 'DB_BACKEND', 'sqlite'),
+                                    (db_driver, 'DB_PATH', path),
+                                    (db_pool, '_pool', pool)):
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+
+        rng = random.Random(5)
+        rows = [(str(uuid.UUID(int=rng.getrandbits(128), version=4)), f"User {i}",
+                 f"user{i}@example.com", rng.randint(18, 90)) for i in range(ROW_COUNT)]
+        connection = db_pool.connect_to_prodev()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_table(connection)
+            cursor = connection.cursor()
+            cursor.executemany("INSERT INTO user_data (user_id, name, email, age) "
+                               "VALUES (%s, %s, %s, %s)", rows)
+            connection.commit()
+            cursor.close()
+        finally:
+            connection.close()
+        cls.rows = rows
+
+    def stream(self, **kwargs):
+        """All rows of stream_users_in_batches, as tuples."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            batches = list(batch_processing.stream_users_in_batches(
+                row_format='tuple', **kwargs))
+        self.assertTrue(all(len(batch) <= kwargs['batch_size'] for batch in batches))
+        return [tuple(row) for batch in batches for row in batch]
+
+    def test_ordered_matches_serial(self) -> None:
+        """
+        Test that an ordered partitioned scan returns the serial rows in user_id order.
+        """
+        serial = self.stream(batch_size=64, partitions=1)
+        self.assertEqual(len(serial), ROW_COUNT)
+        for partitions in (2, 4):
+            with self.subTest(partitions=partitions):
+                scanned = self.stream(batch_size=64, partitions=partitions)
+                self.assertEqual(scanned, sorted(serial))
+
+    def test_unordered_matches_serial(self) -> None:
+        """
+        Test that an unordered partitioned scan returns each row once.
+        """
+        serial = self.stream(batch_size=50, partitions=1)
+        scanned = self.stream(batch_size=50, partitions=4, ordered=False)
+        self.assertEqual(sorted(scanned), sorted(serial))
+
+    def test_where_matches_serial(self) -> None:
+        """
+        Test that pushed-down predicates filter every partition the same way.
+        """
+        where = [Predicate('age', '>', 60)]
+        serial = self.stream(batch_size=32, partitions=1, where=where)
+        scanned = self.stream(batch_size=32, partitions=3, where=where)
+        self.assertEqual(scanned, sorted(serial))
+        self.assertEqual(len(serial), sum(1 for row in self.rows if row[3] > 60))
+
+    def test_partitions_capped_at_pool_size(self) -> None:
+        """
+        Test that asking for more partitions than connections still works.
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            batches = list(scan_partitioned(100, 8, dictionary=False))
+        self.assertEqual(sum(len(batch) for batch in batches), ROW_COUNT)
+
+    def test_early_close_returns_connections(self) -> None:
+        """
+        Test that closing the scan early gives every connection back.
+        """
+        batches = scan_partitioned(10, 4)
+        next(batches)
+        batches.close()
+        borrowed = [db_pool.connect_to_prodev() for _ in range(4)]
+        self.assertNotIn(None, borrowed)
+        for connection in borrowed:
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit tests for pipeline.py and prefetch.py.
+"""
+import unittest
+from pipeline import Pipeline
+from prefetch import prefetched
+
+
+def _tracked(items, closed):
+    """Generator over 'items' that records in 'closed' when it is closed."""
+    try:
+        yield from items
+    finally:
+        closed.append(True)
+
+
+def _double(value):
+    return value * 2
+
+
+class TestPipelineStages(unittest.TestCase):
+    """
+    Test class for stage ordering, batching and windows.
+    """
+
+    def test_stages_run_in_order(self) -> None:
+        """
+        Test that stages apply in the order they were added.
+        """
+        mapped_first = list(Pipeline(range(6)).map(_double).filter(lambda x: x % 4 == 0))
+        filtered_first = list(Pipeline(range(6)).filter(lambda x: x % 4 == 0).map(_double))
+        self.assertEqual(mapped_first, [0, 4, 8])
+        self.assertEqual(filtered_first, [0, 8])
+
+    def test_pooled_stages_keep_input_order(self) -> None:
+        """
+        Test that thread and process stages yield results in input order.
+        """
+        for mode in ('thread', 'process'):
+            with self.subTest(mode=mode):
+                result = list(Pipeline(range(50)).map(_double, mode=mode, workers=3))
+                self.assertEqual(result, [x * 2 for x in range(50)])
+
+    def test_unordered_stage_yields_every_item(self) -> None:
+        """
+        Test that ordered=False still yields each result once.
+        """
+        result = list(Pipeline(range(50)).map(_double, mode='thread', workers=4,
+                                              ordered=False))
+        self.assertEqual(sorted(result), [x * 2 for x in range(50)])
+
+    def test_batch(self) -> None:
+        """
+        Test that batch() groups items and keeps a short last batch.
+        """
+        self.assertEqual(list(Pipeline(range(7)).batch(3)), [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_windows(self) -> None:
+        """
+        Test tumbling, sliding and skipping windows.
+        """
+        cases = [
+            (3, None, [(0, 1, 2), (3, 4, 5)]),
+            (3, 1, [(0, 1, 2), (1, 2, 3), (2, 3, 4), (3, 4, 5), (4, 5, 6)]),
+            (2, 3, [(0, 1), (3, 4)]),
+        ]
+        for size, step, expected in cases:
+            with self.subTest(size=size, step=step):
+                self.assertEqual(list(Pipeline(range(7)).window(size, step)), expected)
+
+    def test_stats(self) -> None:
+        """
+        Test that each stage counts its items, source first.
+        """
+        pipeline = Pipeline(range(10)).filter(lambda x: x % 2).batch(2)
+        self.assertEqual(pipeline.run(), 3)
+        counts = [(s['name'], s['items_in'], s['items_out']) for s in pipeline.stats()]
+        self.assertEqual(counts, [('source', 10, 10), ('<lambda>', 10, 5),
+                                  ('batch', 5, 3), ('sink', 3, 0)])
+
+    def test_reduce(self) -> None:
+        """
+        Test that reduce() folds every item.
+        """
+        self.assertEqual(Pipeline(range(5)).map(_double).reduce(lambda a, b: a + b, 0), 20)
+
+    def test_unknown_mode(self) -> None:
+        """
+        Test that an unknown stage mode raises a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            Pipeline(range(3)).map(_double, mode='fiber')
+
+
+class TestPipelineClose(unittest.TestCase):
+    """
+    Test class for close() reaching the source.
+    """
+
+    def test_close_reaches_source(self) -> None:
+        """
+        Test that closing the pipeline early closes the source.
+        """
+        builds = {
+            'inline': lambda p: p.map(_double).window(2),
+            'thread': lambda p: p.map(_double, mode='thread', workers=2),
+            'buffer': lambda p: p.buffer(2).batch(2),
+        }
+        for name, build in builds.items():
+            with self.subTest(stages=name):
+                closed = []
+                items = iter(build(Pipeline(_tracked(range(1000), closed))))
+                next(items)
+                items.close()
+                self.assertEqual(closed, [True])
+
+    def test_run_closes_source_on_sink_error(self) -> None:
+        """
+        Test that a failing sink still closes the source.
+        """
+        closed = []
+
+        def sink(item):
+            raise RuntimeError("sink failed")
+        with self.assertRaises(RuntimeError):
+            Pipeline(_tracked(range(10), closed)).buffer().run(sink)
+        self.assertEqual(closed, [True])
+
+
+class TestPrefetched(unittest.TestCase):
+    """
+    Test class for the prefetched function.
+    """
+
+    def test_yields_all_items(self) -> None:
+        """
+        Test that every item comes through in order.
+        """
+        self.assertEqual(list(prefetched(iter(range(100)), 3)), list(range(100)))
+
+    def test_reraises_source_error(self) -> None:
+        """
+        Test that an exception in the source is re-raised in the consumer.
+        """
+        def failing():
+            yield 1
+            raise KeyError('boom')
+        with self.assertRaises(KeyError):
+            list(prefetched(failing()))
+
+    def test_early_stop_closes_source(self) -> None:
+        """
+        Test that stopping early closes the source on its thread.
+        """
+        closed = []
+        items = prefetched(_tracked(range(1000), closed), 2)
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pure functions of sampling.py.
+"""
+import math
+import unittest
+from collections import Counter
+from sampling import mean_interval, reservoir_sample
+
+
+class TestReservoirSample(unittest.TestCase):
+    """
+    Test class for the reservoir_sample function.
+    """
+
+    def test_fewer_items_than_size(self) -> None:
+        """
+        Test that every item is kept when there are fewer than 'size'.
+        """
+        self.assertEqual(reservoir_sample(range(3), 5, seed=1), [0, 1, 2])
+        self.assertEqual(reservoir_sample(range(3), 0, seed=1), [])
+
+    def test_size_and_distinct(self) -> None:
+        """
+        Test that the sample has 'size' distinct items from the input.
+        """
+        sample = reservoir_sample(iter(range(10000)), 100, seed=3)
+        self.assertEqual(len(set(sample)), 100)
+        self.assertTrue(all(0 <= item < 10000 for item in sample))
+
+    def test_seeded(self) -> None:
+        """
+        Test that the same seed draws the same sample.
+        """
+        self.assertEqual(reservoir_sample(range(1000), 10, seed=42),
+                         reservoir_sample(range(1000), 10, seed=42))
+
+    def test_uniform(self) -> None:
+        """
+        Test that every item is drawn about equally often.
+        """
+        trials, n, size = 4000, 20, 5
+        counts = Counter()
+        for seed in range(trials):
+            counts.update(reservoir_sample(range(n), size, seed=seed))
+        expected = trials * size / n
+        for item in range(n):
+            self.assertAlmostEqual(counts[item] / expected, 1.0, delta=0.15, msg=item)
+
+
+class TestMeanInterval(unittest.TestCase):
+    """
+    Test class for the mean_interval function.
+    """
+
+    def test_interval(self) -> None:
+        """
+        Test the estimate and 95% bounds against a hand computation.
+        """
+        result = mean_interval([1, 2, 3, 4, 5])
+        stderr = math.sqrt(2.5) / math.sqrt(5)
+        self.assertEqual(result['estimate'], 3.0)
+        self.assertEqual(result['n'], 5)
+        self.assertAlmostEqual(result['stderr'], stderr)
+        self.assertAlmostEqual(result['low'], 3.0 - 1.959964 * stderr, places=5)
+        self.assertAlmostEqual(result['high'], 3.0 + 1.959964 * stderr, places=5)
+
+    def test_finite_population(self) -> None:
+        """
+        Test that sampling the whole population leaves no error.
+        """
+        result = mean_interval([1, 2, 3, 4, 5], population=5)
+        self.assertEqual(result['stderr'], 0.0)
+        self.assertEqual((result['low'], result['high']), (3.0, 3.0))
+
+    def test_too_few_values(self) -> None:
+        """
+        Test that fewer than two values give no bounds.
+        """
+        self.assertIsNone(mean_interval([])['estimate'])
+        single = mean_interval([7])
+        self.assertEqual(single['estimate'], 7.0)
+        self.assertIsNone(single['low'])
+        self.assertIsNone(single['stderr'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the CSV loader of seed.py.
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from seed import CsvChunk, load_data_from_csv
+
+CSV_TEXT = (
+    'name,email,age\n'
+    'Ann,ann@example.com,31\n'
+    '"Bob, Jr.",bob@example.com,67\n'
+    'Cy,cy@example.com,not a number\n'
+    '\n'
+    'Dee,dee@example.com,18\n'
+    'Éva,eva@example.com,44\n'
+    'Fay,fay@example.com,52\n'
+    'Gus,gus@example.com,29\n'
+)
+VALID = [
+    ('Ann', 'ann@example.com', 31),
+    ('Bob, Jr.', 'bob@example.com', 67),
+    ('Dee', 'dee@example.com', 18),
+    ('Éva', 'eva@example.com', 44),
+    ('Fay', 'fay@example.com', 52),
+    ('Gus', 'gus@example.com', 29),
+]
+
+
+class TestLoadDataFromCsv(unittest.TestCase):
+    """
+    Test class for chunked loading and resume offsets.
+    """
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'users.csv')
+        self.rejects = os.path.join(directory.name, 'users.csv.rejects')
+        with open(self.filename, 'w', encoding='utf-8', newline='') as f:
+            f.write(CSV_TEXT)
+
+    def load(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return list(load_data_from_csv(self.filename, reject_file=self.rejects,
+                                           **kwargs))
+
+    def test_chunks(self) -> None:
+        """
+        Test that valid rows come in chunks and bad ones are rejected.
+        """
+        chunks = self.load(chunk_size=2)
+        self.assertTrue(all(isinstance(chunk, CsvChunk) for chunk in chunks))
+        self.assertEqual([row for chunk in chunks for row in chunk], VALID)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2, 0])
+        with open(self.rejects, encoding='utf-8') as f:
+            self.assertIn('not a number', f.read())
+
+    def test_last_chunk_ends_at_end_of_file(self) -> None:
+        """
+        Test that the last chunk's offset and row_number cover the file.
+        """
+        last = self.load(chunk_size=4)[-1]
+        self.assertEqual(last.offset, os.path.getsize(self.filename))
+        self.assertEqual(last.row_number, 7)
+
+    def test_resume_from_every_chunk(self) -> None:
+        """
+        Test that resuming from a chunk's offset yields exactly the rest.
+        """
+        chunks = self.load(chunk_size=2)
+        for i, chunk in enumerate(chunks[:-1]):
+            with self.subTest(chunk=i):
+                resumed = self.load(chunk_size=2, start_offset=chunk.offset,
+                                    start_row=chunk.row_number)
+                self.assertEqual([row for part in resumed for row in part],
+                                 [row for part in chunks[i + 1:] for row in part])
+                self.assertEqual([(part.offset, part.row_number) for part in resumed],
+                                 [(part.offset, part.row_number) for part in chunks[i + 1:]])
+
+    def test_resume_appends_rejects(self) -> None:
+        """
+        Test that a resumed load appends to the reject file.
+        """
+        self.load(chunk_size=1)
+        self.load(chunk_size=1, start_offset=len('name,email,age\n'))
+        with open(self.rejects, encoding='utf-8') as f:
+            self.assertEqual(f.read().count('not a number'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Unit tests for sketches.py.
+"""
+import pickle
+import random
+import unittest
+from sketches import BloomFilter, HyperLogLog, KLLSketch
+
+
+def _rank_error(sorted_values, value, fraction):
+    """How far (as a fraction of the data) 'value' is from 'fraction'."""
+    lo = sum(1 for v in sorted_values if v < value) / len(sorted_values)
+    hi = sum(1 for v in sorted_values if v <= value) / len(sorted_values)
+    if lo <= fraction <= hi:
+        return 0.0
+    return min(abs(fraction - lo), abs(fraction - hi))
+
+
+class TestKLLSketch(unittest.TestCase):
+    """
+    Test class for the KLL quantile sketch.
+    """
+
+    FRACTIONS = (0.01, 0.25, 0.5, 0.75, 0.95, 0.99)
+    # Rank error is about 1.7 / k; allow three times that
+    TOLERANCE = 3 * 1.7 / 200
+
+    def setUp(self) -> None:
+        rng = random.Random(7)
+        self.values = [rng.gauss(50, 15) for _ in range(50000)]
+        self.sorted_values = sorted(self.values)
+
+    def assertAccurate(self, sketch) -> None:
+        for fraction, value in zip(self.FRACTIONS, sketch.quantiles(self.FRACTIONS)):
+            self.assertLessEqual(_rank_error(self.sorted_values, value, fraction),
+                                 self.TOLERANCE, f"p{fraction * 100:g}")
+
+    def test_quantiles(self) -> None:
+        """
+        Test that quantiles stay within the rank error bound.
+        """
+        sketch = KLLSketch(seed=1)
+        for value in self.values:
+            sketch.add(value)
+        self.assertEqual(sketch.count, len(self.values))
+        self.assertAccurate(sketch)
+
+    def test_merge(self) -> None:
+        """
+        Test that merged partial sketches are as accurate as one sketch.
+        """
+        parts = [KLLSketch(seed=i) for i in range(4)]
+        for i, value in enumerate(self.values):
+            parts[i % 4].add(value)
+        merged = parts[0]
+        for part in parts[1:]:
+            merged = merged.merge(pickle.loads(pickle.dumps(part)))
+        self.assertEqual(merged.count, len(self.values))
+        self.assertAccurate(merged)
+
+    def test_empty(self) -> None:
+        """
+        Test that an empty sketch has no quantiles.
+        """
+        self.assertIsNone(KLLSketch().quantile(0.5))
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """
+    Test class for the HyperLogLog distinct counter.
+    """
+
+    # Standard error is about 1.04 / sqrt(2**14); allow four times that
+    TOLERANCE = 4 * 1.04 / 128
+
+    def test_count(self) -> None:
+        """
+        Test that large and small counts stay within the error bound.
+        """
+        for distinct in (100, 50000):
+            with self.subTest(distinct=distinct):
+                hll = HyperLogLog()
+                for i in range(distinct):
+                    hll.add(f"user{i}@example.com")
+                    hll.add(f"user{i}@example.com")
+                self.assertAlmostEqual(hll.count() / distinct, 1.0, delta=self.TOLERANCE)
+
+    def test_merge(self) -> None:
+        """
+        Test that merging overlapping counters counts the union.
+        """
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(30000):
+            first.add(i)
+        for i in range(20000, 50000):
+            second.add(i)
+        merged = first.merge(pickle.loads(pickle.dumps(second)))
+        self.assertAlmostEqual(merged.count() / 50000, 1.0, delta=self.TOLERANCE)
+
+    def test_merge_different_precision(self) -> None:
+        """
+        Test that counters of different precision refuse to merge.
+        """
+        with self.assertRaises(ValueError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+    def test_for_error(self) -> None:
+        """
+        Test that for_error() picks a precision meeting the error.
+        """
+        self.assertEqual(HyperLogLog.for_error(0.01).precision, 14)
+        self.assertEqual(HyperLogLog.for_error(10).precision, 4)
+
+
+class TestBloomFilter(unittest.TestCase):
+    """
+    Test class for the Bloom filter.
+    """
+
+    def test_no_false_negatives(self) -> None:
+        """
+        Test that every added value is reported present.
+        """
+        bloom = BloomFilter(5000)
+        emails = [f"user{i}@example.com" for i in range(5000)]
+        for email in emails:
+            bloom.add(email)
+        self.assertTrue(all(email in bloom for email in emails))
+
+    def test_false_positive_rate(self) -> None:
+        """
+        Test that the false positive rate stays near error_rate.
+        """
+        bloom = BloomFilter(10000, error_rate=0.01)
+        for i in range(10000):
+            bloom.add(f"in{i}")
+        hits = sum(1 for i in range(20000) if f"out{i}" in bloom)
+        self.assertLess(hits / 20000, 0.02)
+
+    def test_add_reports_repeats(self) -> None:
+        """
+        Test that add() returns True for a value already present.
+        """
+        bloom = BloomFilter(100)
+        self.assertFalse(bloom.add('a@example.com'))
+        self.assertTrue(bloom.add('a@example.com'))
+        self.assertEqual(bloom.count, 1)
+
+    def test_merge(self) -> None:
+        """
+        Test that a merged filter holds the values of both.
+        """
+        first, second = BloomFilter(1000), BloomFilter(1000)
+        for i in range(500):
+            first.add(f"a{i}")
+            second.add(f"b{i}")
+        merged = first.merge(pickle.loads(pickle.dumps(second)))
+        self.assertTrue(all(f"a{i}" in merged and f"b{i}" in merged for i in range(500)))
+
+    def test_merge_different_shapes(self) -> None:
+        """
+        Test that filters of different shapes refuse to merge.
+        """
+        with self.assertRaises(ValueError):
+            BloomFilter(1000).merge(BloomFilter(2000))
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that a bad capacity or error rate raises a ValueError.
+        """
+        for capacity, error_rate in ((0, 0.01), (10, 0), (10, 1)):
+            with self.subTest(capacity=capacity, error_rate=error_rate):
+                with self.assertRaises(ValueError):
+                    BloomFilter(capacity, error_rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Unit tests for user_ids.py and the keyset tokens of 2-lazy_paginate.py.
+"""
+import time
+import unittest
+import uuid
+from user_ids import to_binary, to_text, uuid7
+
+lazy_paginate = __import__('2-lazy_paginate')
+
+
+class TestUuid7(unittest.TestCase):
+    """
+    Test class for the uuid7 function.
+    """
+
+    def test_layout(self) -> None:
+        """
+        Test the version, variant and embedded timestamp.
+        """
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertLessEqual(before, value.int >> 80)
+        # The counter may borrow a millisecond or two under heavy use
+        self.assertLessEqual(value.int >> 80, after + 2)
+
+    def test_strictly_increasing(self) -> None:
+        """
+        Test that ids made in a tight loop sort in creation order.
+        """
+        values = [uuid7() for _ in range(20000)]
+        self.assertEqual(sorted(values), values)
+        self.assertEqual(len(set(values)), len(values))
+        # The byte form (BINARY(16)) sorts the same way
+        as_bytes = [value.bytes for value in values]
+        self.assertEqual(sorted(as_bytes), as_bytes)
+
+    def test_text_binary_round_trip(self) -> None:
+        """
+        Test that to_binary and to_text invert each other.
+        """
+        value = uuid7()
+        text = str(value)
+        self.assertEqual(to_text(to_binary(text)), text)
+        self.assertEqual(to_binary(value), value.bytes)
+        self.assertEqual(to_binary(bytearray(value.bytes)), value.bytes)
+        self.assertEqual(to_text(value), text)
+
+
+class TestKeysetToken(unittest.TestCase):
+    """
+    Test class for encode_token and decode_token.
+    """
+
+    def test_round_trip(self) -> None:
+        """
+        Test that a token decodes back to the user_id it was made from.
+        """
+        for user_id in (str(uuid.uuid4()), str(uuid7()), None):
+            with self.subTest(user_id=user_id):
+                token = lazy_paginate.encode_token(user_id)
+                self.assertEqual(lazy_paginate.decode_token(token), user_id)
+
+    def test_url_safe(self) -> None:
+        """
+        Test that tokens need no escaping in a URL.
+        """
+        token = lazy_paginate.encode_token('ÿ?/+' * 10)
+        self.assertNotRegex(token, r'[+/]')
+
+    def test_invalid_token(self) -> None:
+        """
+        Test that a malformed token raises a ValueError.
+        """
+        valid = lazy_paginate.encode_token('x')
+        for token in ('not a token', valid[:-4], 'e30=', 'bnVsbA=='):
+            with self.subTest(token=token):
+                with self.assertRaises(ValueError):
+                    lazy_paginate.decode_token(token)
+
+
+if __name__ == '__main__':
+    unittest.main()
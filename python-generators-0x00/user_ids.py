@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+"""
+This module contains the user_id key formats of user_data.
+
+USER_ID_FORMAT (environment variable) picks how user_id is stored:
+
+    char36    (default) random uuid4 strings in a VARCHAR(36)
+    binary16  time-ordered, UUIDv7-style ids in a BINARY(16)
+
+v7 ids start with a millisecond timestamp, so new rows are appended at
+the right-hand end of the primary key instead of landing on random
+pages, and each key (repeated in every secondary index) is 16 bytes
+instead of 36. Queries read binary ids back through BIN_TO_UUID(), so
+the streams still yield canonical UUID strings.
+
+    USER_ID_FORMAT=binary16 python user_ids.py migrate      # convert user_data
+    python user_ids.py bench [ROWS]                        # char36 vs binary16
+"""
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+from db_driver import Error, get_driver
+
+USER_ID_FORMATS = ('char36', 'binary16')
+USER_ID_FORMAT = os.getenv('USER_ID_FORMAT', 'char36')
+if USER_ID_FORMAT not in USER_ID_FORMATS:
+    raise ValueError(f"USER_ID_FORMAT must be one of {USER_ID_FORMATS}, got {USER_ID_FORMAT!r}")
+BINARY_IDS = USER_ID_FORMAT == 'binary16'
+
+# user_id as a text expression, e.g. to hash it inside a query
+USER_ID_TEXT = "BIN_TO_UUID(user_id)" if BINARY_IDS else "user_id"
+# How queries select user_id so that it always comes back as text.
+# The alias keeps the column name; ORDER BY must then say user_data.user_id
+# to sort on the stored key rather than on the converted string.
+USER_ID_SELECT = f"{USER_ID_TEXT} AS user_id" if BINARY_IDS else "user_id"
+
+# Rows copied per transaction by migrate_to_binary()
+MIGRATE_CHUNK_SIZE = 1000
+
+_clock_lock = threading.Lock()
+_last_millis = 0
+_last_counter = 0
+
+
+# --- Conversions ---
+def uuid7():
+    """
+    Returns a new time-ordered uuid.UUID in the UUIDv7 layout: 48-bit Unix
+    milliseconds, a 12-bit counter, then 62 random bits. The counter keeps
+    ids made in the same millisecond (by this process) strictly increasing.
+    """
+    global _last_millis, _last_counter
+    with _clock_lock:
+        millis = time.time_ns() // 1_000_000
+        if millis > _last_millis:
+            # Start low in the 12-bit range to leave room for increments
+            counter = secrets.randbits(10)
+        else:
+            millis = _last_millis
+            counter = _last_counter + 1
+            if counter > 0xFFF:
+                # Counter exhausted: borrow the next millisecond
+                millis += 1
+                counter = secrets.randbits(10)
+        _last_millis, _last_counter = millis, counter
+
+    value = (millis << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+
+def to_binary(user_id):
+    """16-byte form of a user_id given as a string, uuid.UUID or bytes."""
+    if isinstance(user_id, (bytes, bytearray)):
+        return bytes(user_id)
+    if not isinstance(user_id, uuid.UUID):
+        user_id = uuid.UUID(user_id)
+    return user_id.bytes
+
+
+def to_text(user_id):
+    """Canonical string form of a user_id given as bytes, uuid.UUID or string."""
+    if isinstance(user_id, (bytes, bytearray)):
+        return str(uuid.UUID(bytes=bytes(user_id)))
+    return str(user_id)
+
+
+def new_user_id():
+    """A fresh user_id in the configured storage format."""
+    if BINARY_IDS:
+        return uuid7().bytes
+    return str(uuid.uuid4())
+
+
+def user_id_param(user_id):
+    """
+    Converts a canonical user_id string into the value to bind when
+    comparing with the stored column (WHERE user_id > %s). Binary and
+    string ids sort the same way, so range and keyset scans still work.
+    """
+    return to_binary(user_id) if BINARY_IDS else to_text(user_id)
+
+
+def user_id_type(binary=BINARY_IDS):
+    """SQL type of the user_id column."""
+    return get_driver().binary_id_type if binary else "VARCHAR(36)"
+
+
+# --- Migration ---
+def migrate_to_binary(connection, chunk_size=MIGRATE_CHUNK_SIZE):
+    """
+    Converts an existing char36 user_data table to binary16 keys.
+
+    Rows are copied in user_id order, one committed chunk at a time, into
+    user_data_binary. The tables are then swapped: user_data becomes the
+    binary table and the old one is kept as user_data_char36 (drop it once
+    satisfied). The secondary indexes move to the new table: they are
+    dropped from the old one (SQLite index names are global) and built on
+    the new one in a single pass after the copy. With change tracking on
+    (see change_stream.py), updated_at is copied as is and its triggers
+    are moved over, so change consumers carry on from their watermarks.
+
+    Existing ids keep their value, only their storage changes; ids
+    inserted afterwards are time-ordered. Stop ingest while this runs:
+    rows written to user_data during the copy are not carried over.
+    Returns the number of rows copied.
+    """
+    seed = __import__('seed')
+    user_indexes = __import__('user_indexes')
+    change_stream = __import__('change_stream')
+    driver = get_driver()
+    reader = connection.cursor()
+    writer = connection.cursor()
+    copied = 0
+    try:
+        reader.execute("SELECT user_id FROM user_data LIMIT 1")
+        first = reader.fetchone()
+        if first is not None and isinstance(first[0], (bytes, bytearray)):
+            print("user_data already uses binary user_ids; nothing to migrate.")
+            return 0
+
+        tracked = change_stream.change_tracking_enabled(connection)
+        user_columns = ('user_id', 'name', 'email', 'age')
+        columns = user_columns
+        indexes = dict(user_indexes.USER_DATA_INDEXES)
+        writer.execute(seed.USER_DATA_TABLE.format(table='user_data_binary',
+                                                   user_id_type=user_id_type(binary=True)))
+        if tracked:
+            column = change_stream.CHANGE_COLUMN
+            writer.execute(f"ALTER TABLE user_data_binary ADD COLUMN {column} "
+                           f"{driver.updated_at_column}")
+            columns += (column,)
+            indexes.update(change_stream.CHANGE_INDEXES)
+        column_list = ', '.join(columns)
+        insert = (f"INSERT INTO user_data_binary ({column_list}) "
+                  f"VALUES ({', '.join(['%s'] * len(columns))})")
+        last = ''
+        while True:
+            # Keyset walk: every chunk is one index seek, however far in
+            reader.execute(
+                f"SELECT {column_list} FROM user_data "
+                "WHERE user_id > %s ORDER BY user_id LIMIT %s", (last, chunk_size))
+            rows = reader.fetchall()
+            if not rows:
+                break
+            writer.executemany(insert, [(to_binary(row[0]),) + tuple(row[1:]) for row in rows])
+            connection.commit()
+            copied += len(rows)
+            last = rows[-1][0]
+
+        for statement in driver.rename_tables([('user_data', 'user_data_char36'),
+                                               ('user_data_binary', 'user_data')]):
+            writer.execute(statement)
+        connection.commit()
+
+        if tracked:
+            # SQLite's triggers followed the old table; recreate them on the new one
+            column = change_stream.CHANGE_COLUMN
+            for statement in (driver.untouch_statements('user_data', column)
+                              + driver.touch_statements('user_data', column, user_columns)):
+                writer.execute(statement)
+            connection.commit()
+
+        old_indexes = user_indexes.index_names(connection, 'user_data_char36')
+        user_indexes.drop_indexes(connection, old_indexes, table='user_data_char36')
+        user_indexes.create_indexes(connection, indexes)
+        missing = set(indexes) - user_indexes.index_names(connection)
+        if missing:
+            print(f"Warning: indexes {sorted(missing)} are missing on the migrated "
+                  "user_data; run 'python user_indexes.py build'.")
+        print(f"Migrated {copied} rows to binary user_ids; "
+              "the old table is kept as 'user_data_char36'.")
+    except Error as e:
+        connection.rollback()
+        print(f"Error migrating user_data: {e}")
+    finally:
+        reader.close()
+        writer.close()
+    return copied
+
+
+def table_size(connection, table):
+    """(data bytes, index bytes) of 'table', or None if unavailable."""
+    cursor = connection.cursor()
+    try:
+        # Refresh InnoDB's size estimates before reading them
+        cursor.execute(get_driver().analyze(table))
+        if cursor.description:
+            cursor.fetchall()
+        cursor.execute(get_driver().table_size_query, (table,))
+        return cursor.fetchone()
+    except Error:
+        return None
+    finally:
+        cursor.close()
+
+
+def _bench(connection, rows, binary, chunk_size=MIGRATE_CHUNK_SIZE):
+    """Inserts 'rows' synthetic users into a scratch table; returns seconds and size."""
+    seed = __import__('seed')
+    table = f"user_ids_bench_{'binary16' if binary else 'char36'}"
+    make_id = (lambda: uuid7().bytes) if binary else (lambda: str(uuid.uuid4()))
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(seed.USER_DATA_TABLE.format(table=table,
+                                                   user_id_type=user_id_type(binary)))
+        connection.commit()
+        insert = f"INSERT INTO {table} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+        started = time.perf_counter()
+        for start in range(0, rows, chunk_size):
+            cursor.executemany(insert, [(make_id(), f"User {i}", f"user{i}@example.com", i % 100)
+                                        for i in range(start, min(start + chunk_size, rows))])
+            connection.commit()
+        seconds = time.perf_counter() - started
+        size = table_size(connection, table)
+        cursor.execute(f"DROP TABLE {table}")
+        connection.commit()
+        return seconds, size
+    finally:
+        cursor.close()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    from db_pool import connect_to_prodev
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('migrate', 'bench'):
+        print("Usage: python user_ids.py migrate | bench [ROWS]")
+        sys.exit(2)
+
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    try:
+        if command == 'migrate':
+            migrate_to_binary(connection)
+        else:
+            rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+            for binary in (False, True):
+                seconds, size = _bench(connection, rows, binary)
+                label = 'binary16 (v7)' if binary else 'char36 (v4)'
+                line = f"{label:<14} {rows / seconds:9.0f} rows/s"
+                if size:
+                    line += f", data {size[0] / 1e6:6.1f} MB, indexes {size[1] / 1e6:6.1f} MB"
+                print(line)
+    finally:
+        connection.close()
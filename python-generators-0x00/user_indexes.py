@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""
+This module contains the secondary indexes of user_data.
+
+seed.create_table builds the indexes declared in USER_DATA_INDEXES along
+with the table. For a bulk load it is cheaper to skip them while the
+rows go in and build each one in a single pass afterwards:
+
+    seed.create_table(connection, defer_indexes=True)
+    seed.insert_data(connection, 'user_data.csv')
+    user_indexes.create_indexes(connection)
+
+On MySQL the build is online (ALGORITHM=INPLACE, LOCK=NONE), so streams
+keep running while it happens.
+
+    python user_indexes.py build | drop | bench
+"""
+import sys
+import time
+from db_driver import Error, get_driver
+from aggregates import AGGREGATE_QUERY
+from user_rows import USER_SELECT, STREAM_FETCH_SIZE
+
+# name -> columns. (age, user_id) lets 'SELECT age' and age filters read
+# the small index instead of the whole table; user_id is there so the
+# index also returns ids in order within an age without a row lookup.
+USER_DATA_INDEXES = {
+    'idx_user_data_age': ('age', 'user_id'),
+}
+
+
+def index_names(connection, table='user_data'):
+    """Names of the secondary indexes that exist on 'table'."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(get_driver().index_names_query, (table,))
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def create_indexes(connection, indexes=USER_DATA_INDEXES, table='user_data'):
+    """
+    Builds every index in 'indexes' ({name: columns}) that does not exist
+    yet. Returns the names that were built.
+    """
+    driver = get_driver()
+    built = []
+    cursor = None
+    try:
+        existing = index_names(connection, table)
+        cursor = connection.cursor()
+        for name, columns in indexes.items():
+            if name in existing:
+                continue
+            started = time.perf_counter()
+            cursor.execute(driver.create_index(name, table, columns))
+            connection.commit()
+            built.append(name)
+            print(f"Index '{name}' on ({', '.join(columns)}) built "
+                  f"in {time.perf_counter() - started:.2f}s.")
+        if built:
+            # Give the planner row estimates for the new indexes
+            cursor.execute(driver.analyze(table))
+            if cursor.description:
+                cursor.fetchall()
+            connection.commit()
+    except Error as e:
+        print(f"Error creating indexes: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+    return built
+
+
+def drop_indexes(connection, indexes=USER_DATA_INDEXES, table='user_data'):
+    """Drops the indexes in 'indexes' that exist. Returns the names dropped."""
+    driver = get_driver()
+    dropped = []
+    cursor = None
+    try:
+        existing = index_names(connection, table)
+        cursor = connection.cursor()
+        for name in indexes:
+            if name in existing:
+                cursor.execute(driver.drop_index(name, table))
+                connection.commit()
+                dropped.append(name)
+    except Error as e:
+        print(f"Error dropping indexes: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+    return dropped
+
+
+# --- Main Execution ---
+# The streaming queries the indexes are meant for
+BENCH_QUERIES = {
+    'stream ages': "SELECT age FROM user_data",
+    'rows age > 25': f"{USER_SELECT} WHERE age > 25",
+    'rows age > 95': f"{USER_SELECT} WHERE age > 95",
+    'count age > 25': "SELECT COUNT(*) FROM user_data WHERE age > 25",
+    'aggregate ages': AGGREGATE_QUERY,
+}
+
+
+def _time_query(connection, query, repeat=3):
+    """Best-of-'repeat' seconds to run 'query' and stream every row."""
+    best = None
+    for _ in range(repeat):
+        cursor = connection.cursor()
+        try:
+            started = time.perf_counter()
+            cursor.execute(query)
+            while cursor.fetchmany(STREAM_FETCH_SIZE):
+                pass
+            seconds = time.perf_counter() - started
+        finally:
+            cursor.close()
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def benchmark(connection):
+    """
+    Times BENCH_QUERIES without, then with, USER_DATA_INDEXES. Wide
+    ranges such as 'age > 25' (batch_processing's filter) only win if the
+    planner still picks a table scan for them; narrow ones should win.
+    """
+    had = index_names(connection) & set(USER_DATA_INDEXES)
+    drop_indexes(connection)
+    before = {label: _time_query(connection, query) for label, query in BENCH_QUERIES.items()}
+    create_indexes(connection)
+    after = {label: _time_query(connection, query) for label, query in BENCH_QUERIES.items()}
+    if not had:
+        drop_indexes(connection)  # Leave the table as we found it
+
+    print(f"{'query':<16} {'no index':>10} {'indexed':>10}")
+    for label in BENCH_QUERIES:
+        print(f"{label:<16} {before[label] * 1000:8.1f}ms {after[label] * 1000:8.1f}ms"
+              f"  x{before[label] / after[label]:.1f}")
+
+
+if __name__ == "__main__":
+    from db_pool import connect_to_prodev
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    actions = {'build': create_indexes, 'drop': drop_indexes, 'bench': benchmark}
+    if command not in actions:
+        print("Usage: python user_indexes.py build | drop | bench")
+        sys.exit(2)
+
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    try:
+        actions[command](connection)
+    finally:
+        connection.close()
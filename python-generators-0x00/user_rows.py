@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+"""
+This module contains the row shapes used when streaming user_data and
+the helper that drains a cursor into them.
+
+A dict per row is convenient but expensive; for large scans the
+generators can hand back plain tuples or a UserRecord instead.
+
+    python user_rows.py [ROWS]   # bytes per row for each format
+"""
+import sys
+import tracemalloc
+from user_ids import USER_ID_SELECT
+
+# Column order used by every streaming query, so tuples are positional
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+# user_id is always selected as text, whatever USER_ID_FORMAT stores
+USER_SELECT_LIST = f"{USER_ID_SELECT}, name, email, age"
+USER_SELECT = f"SELECT {USER_SELECT_LIST} FROM user_data"
+
+# Rows pulled from the server per round trip in streaming mode
+STREAM_FETCH_SIZE = 1000
+
+ROW_FORMATS = ('dict', 'tuple', 'record')
+
+
+class UserRecord:
+    """
+    A lightweight user_data row.
+    __slots__ means no per-instance __dict__, so it is much smaller than
+    the dict a dictionary=True cursor builds for every row.
+
+    Fields read as attributes (row.name) or, like the dict rows, by
+    column name (row['name'], row.get('age'), dict(row)).
+    """
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __getitem__(self, column):
+        if column not in USER_COLUMNS:
+            raise KeyError(column)
+        return getattr(self, column)
+
+    def get(self, column, default=None):
+        return getattr(self, column) if column in USER_COLUMNS else default
+
+    def keys(self):
+        return USER_COLUMNS
+
+    def values(self):
+        return (self.user_id, self.name, self.email, self.age)
+
+    def items(self):
+        return zip(USER_COLUMNS, self.values())
+
+    def __iter__(self):
+        # Iterates column names, as a dict row would
+        return iter(USER_COLUMNS)
+
+    def __len__(self):
+        return len(USER_COLUMNS)
+
+    def __contains__(self, column):
+        return column in USER_COLUMNS
+
+    def __repr__(self):
+        return (f"UserRecord(user_id={self.user_id!r}, name={self.name!r}, "
+                f"email={self.email!r}, age={self.age!r})")
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return all(getattr(self, c) == getattr(other, c) for c in USER_COLUMNS)
+
+
+def row_factory(row_format, columns=USER_COLUMNS):
+    """
+    Returns a callable that turns a raw cursor tuple into 'row_format',
+    or None when the tuple can be used as is.
+    """
+    if row_format == 'tuple':
+        return None
+    if row_format == 'record':
+        return lambda row: UserRecord(*row)
+    if row_format == 'dict':
+        return lambda row: dict(zip(columns, row))
+    raise ValueError(f"row_format must be one of {ROW_FORMATS}, got {row_format!r}")
+
+
+def fetch_rows(cursor, fetch_size=STREAM_FETCH_SIZE, row_format='tuple'):
+    """
+    Generator that drains an executed cursor 'fetch_size' rows at a time
+    and yields each row in 'row_format'.
+    """
+    make_row = row_factory(row_format)
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        if make_row is None:
+            yield from rows
+        else:
+            yield from map(make_row, rows)
+
+
+def discard_unread_result(connection):
+    """
+    Reads and throws away whatever is left of an unbuffered result.
+    MySQL cannot abandon a half-read result set, so this must run before
+    the cursor is closed when a consumer stops early.
+    """
+    if getattr(connection, 'unread_result', False):
+        connection.consume_results()
+
+
+# --- Main Execution ---
+def _bytes_per_row(make_row, rows):
+    """Memory held by the row containers alone, per row."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [make_row(row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Don't count the list holding them
+    return (after - before - sys.getsizeof(held)) / len(held)
+
+
+if __name__ == "__main__":
+    """
+    Builds the same rows in every format and reports what each costs.
+    The field values are shared between formats, so the figures are the
+    per-row overhead of the container itself, which is all that changes.
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    # Lists, so the 'tuple' format really builds a new tuple per row
+    raw = [[f"{i:08x}-0000-4000-8000-000000000000", f"User {i}",
+            f"user{i}@example.com", i % 100] for i in range(count)]
+
+    print(f"Per-row container memory over {count} rows:")
+    baseline = None
+    for row_format in ('dict', 'record', 'tuple'):
+        make_row = row_factory(row_format) or tuple
+        size = _bytes_per_row(make_row, raw)
+        baseline = baseline or size
+        print(f"  {row_format:<7} {size:7.1f} bytes/row  ({size / baseline:.0%} of dict)")
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+"""
+This module contains the incrementally maintained statistics for
+user_data: a running count/sum/min/max of ages kept in the small
+user_data_stats table.
+
+seed.insert_data updates the stats in the same transaction as each
+chunk it inserts, so count/average queries become a single-row lookup
+instead of a table scan. Changes made to user_data by any other route
+are not tracked; run this module with 'verify' to detect drift and
+'rebuild' to fix it:
+
+    python user_stats.py verify
+    python user_stats.py rebuild
+"""
+import sys
+from db_driver import Error, get_driver
+from aggregates import AGGREGATE_QUERY, aggregate_ages_sql, stats_from_row
+
+CREATE_STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS user_data_stats (
+    column_name VARCHAR(64) PRIMARY KEY,
+    row_count BIGINT NOT NULL,
+    total BIGINT NOT NULL,
+    min_value DECIMAL(3, 0) NULL,
+    max_value DECIMAL(3, 0) NULL
+);
+"""
+
+
+def _seed_stats_query():
+    """Seeds the 'age' row from the current table contents, unless it exists."""
+    return (
+        f"{get_driver().insert_ignore} INTO user_data_stats "
+        "(column_name, row_count, total, min_value, max_value) "
+        "SELECT 'age', COUNT(age), COALESCE(SUM(age), 0), MIN(age), MAX(age) "
+        "FROM user_data"
+    )
+
+
+def _add_to_stats_query():
+    """Adds one chunk's count/sum to the 'age' row and widens min/max."""
+    driver = get_driver()
+    new = driver.new_value
+    return f"""
+INSERT INTO user_data_stats (column_name, row_count, total, min_value, max_value)
+VALUES ('age', %s, %s, %s, %s)
+{driver.upsert('column_name')}
+    row_count = row_count + {new('row_count')},
+    total = total + {new('total')},
+    min_value = {driver.least}(COALESCE(min_value, {new('min_value')}), {new('min_value')}),
+    max_value = {driver.greatest}(COALESCE(max_value, {new('max_value')}), {new('max_value')})
+"""
+
+
+def create_stats_table(connection):
+    """
+    Creates user_data_stats if needed and seeds it from the existing
+    rows, so a table that already holds data starts with correct stats.
+    """
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(CREATE_STATS_TABLE)
+        cursor.execute(_seed_stats_query())
+        connection.commit()
+        print("Table 'user_data_stats' created or already exists.")
+    except Error as e:
+        print(f"Error creating stats table: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def record_inserted(cursor, rows, inserted):
+    """
+    Adds the rows of one ingest chunk to the stats. Does NOT commit: the
+    caller commits it together with the chunk, so both land atomically.
+
+    'rows' are the (user_id, name, email, age) tuples sent for the chunk
+    and 'inserted' the number the server kept. If it kept them all, the
+    delta is computed from 'rows'; if INSERT IGNORE dropped some, it is
+    read back from the table by primary key instead.
+    """
+    if not inserted:
+        return
+    if inserted == len(rows):
+        ages = [row[3] for row in rows]
+        delta = (len(ages), sum(ages), min(ages), max(ages))
+    else:
+        placeholders = ', '.join(['%s'] * len(rows))
+        cursor.execute(f"{AGGREGATE_QUERY} WHERE user_id IN ({placeholders})",
+                       tuple(row[0] for row in rows))
+        delta = cursor.fetchone()
+    if delta[0]:
+        cursor.execute(_add_to_stats_query(), delta)
+
+
+def read_stats(connection):
+    """
+    Returns the stored count/sum/avg/min/max of ages (same shape as
+    aggregates.AgeStats.as_dict()), or None if no stats are available.
+    """
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT row_count, total, min_value, max_value "
+            "FROM user_data_stats WHERE column_name = 'age'")
+        row = cursor.fetchone()
+    except Error as e:
+        print(f"Error reading statistics: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+    return None if row is None else stats_from_row(*row).as_dict()
+
+
+def verify_stats(connection):
+    """
+    Recomputes the stats from scratch and compares them with the stored
+    ones. Returns {field: (stored, actual)} for every field that drifted.
+    """
+    stored = read_stats(connection) or {}
+    actual = aggregate_ages_sql(connection)
+    return {field: (stored.get(field), value)
+            for field, value in actual.items()
+            if stored.get(field) != value}
+
+
+def rebuild_stats(connection):
+    """Throws the stored stats away and recomputes them from user_data."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM user_data_stats WHERE column_name = 'age'")
+        cursor.execute(_seed_stats_query())
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    from db_pool import connect_to_prodev
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    if command not in ('verify', 'rebuild'):
+        print("Usage: python user_stats.py [verify|rebuild]")
+        sys.exit(2)
+
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+
+    try:
+        if command == 'rebuild':
+            rebuild_stats(connection)
+            print("Statistics rebuilt from user_data.")
+        else:
+            drift = verify_stats(connection)
+            if not drift:
+                print("Statistics are up to date.")
+            for field, (stored, actual) in drift.items():
+                print(f"Drift in {field}: stored={stored} actual={actual}")
+            sys.exit(1 if drift else 0)
+    except Error as e:
+        print(f"Error checking statistics: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()